@@ -2,11 +2,18 @@
      Initialize the app
 '''
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flasgger import Swagger
 from flask_cors import CORS
 from config import api_config
 from api.models import db
-from api.conf import mail
+from api.conf import (mail, token_cache, username_cache, response_cache,
+                      count_cache, hasher, login_email_limiter,
+                      login_ip_limiter)
+from api.commands import register_commands
+from api.reaper import start_reaper
+from api.metrics import start_stats_logger
+from api.search.backends import init_search
 from api.views.user import USER
 from api.views.business import BUSINESS
 from api.views.review import REVIEW
@@ -63,7 +70,22 @@ def create_app(config_name):
     app.register_blueprint(REVIEW, url_prefix=prefix)
     CORS(app, resources={r"/api/v1*": {"origins": "*"}})
     app.config.from_object(api_config[config_name])
+    if app.config['PROXY_FIX_X_FOR']:
+        # Client address from the X-Forwarded-For of trusted proxies
+        app.wsgi_app = ProxyFix(app.wsgi_app,
+                                x_for=app.config['PROXY_FIX_X_FOR'])
     mail.init_app(app)
+    token_cache.init_app(app)
+    username_cache.init_app(app)
+    response_cache.init_app(app)
+    count_cache.init_app(app)
+    hasher.init_app(app)
+    login_email_limiter.init_app(app)
+    login_ip_limiter.init_app(app)
     db.init_app(app)
     Swagger(app, config=SWAGGER_CONFIG, template=TEMPLATE)
+    register_commands(app)
+    start_reaper(app)
+    start_stats_logger(app)
+    init_search(app)
     return app
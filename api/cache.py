@@ -0,0 +1,113 @@
+'''
+    In-process caches
+'''
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class TTLCache():
+    '''
+        Thread safe LRU cache whose entries expire after a time to live
+    '''
+
+    def __init__(self, config_prefix, maxsize=1024, ttl=300):
+        ''' Cache sizes may be overridden from app config on init_app '''
+        self.config_prefix = config_prefix
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def init_app(self, app):
+        '''
+            Load sizes from <PREFIX>_SIZE and <PREFIX>_TTL configs
+        '''
+        self.maxsize = app.config.get(
+            self.config_prefix + '_SIZE', self.maxsize)
+        self.ttl = app.config.get(self.config_prefix + '_TTL', self.ttl)
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        ''' Get cached value or None when missing or expired '''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        '''
+            Cache value, ttl is capped by the cache ttl
+        '''
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        ''' Remove one entry '''
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        ''' Remove all entries whose value matches the predicate '''
+        with self._lock:
+            for key in [key for key, entry in self._data.items()
+                        if predicate(entry[1])]:
+                del self._data[key]
+
+    def clear(self):
+        ''' Remove all entries, counters keep counting '''
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        ''' Hit/miss counters used to size the cache '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class ResponseCache(TTLCache):
+    '''
+        Cache of serialized responses tagged with the id of the
+        resource they show, so writes can drop exactly their pages
+    '''
+
+    def store(self, key, tag, response):
+        ''' Cache the body, status and headers of a response '''
+        self.set(key, (tag, response.get_data(), response.status_code,
+                       list(response.headers.items())))
+
+    def invalidate(self, tag):
+        ''' Drop every response showing the tagged resource '''
+        self.delete_where(lambda entry: entry[0] == tag)
+
+    def stats(self):
+        ''' Cache counters with the bytes held by cached bodies '''
+        stats = super().stats()
+        with self._lock:
+            stats['bytes'] = sum(
+                len(entry[1][1]) for entry in self._data.values())
+        return stats
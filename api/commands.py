@@ -0,0 +1,87 @@
+'''
+    Flask CLI commands
+'''
+import time
+import click
+from flask import current_app as app
+from flask.cli import with_appcontext
+from api.reaper import reap_expired_tokens
+from api.passwords import calibrate
+from api.models.business import Business
+from api.conf import search_index, fuzzy_index, suggest_index
+from api.search.backends import (build_search_index, build_fuzzy_index,
+                                 build_suggest_index)
+
+
+@click.command('reap-tokens')
+@click.option('--batch-size', type=int, default=None,
+              help='Rows deleted per statement')
+@with_appcontext
+def reap_tokens_command(batch_size):
+    ''' Delete expired access and password reset tokens '''
+    reclaimed = reap_expired_tokens(
+        batch_size or app.config['TOKEN_REAPER_BATCH_SIZE'])
+    click.echo('Reclaimed {access_tokens} access tokens and '
+               '{password_reset_tokens} password reset tokens'.format(
+                   **reclaimed))
+
+
+@click.command('calibrate-password-hash')
+@click.option('--target-ms', type=int, default=250,
+              help='Wanted hashing time of one password')
+def calibrate_password_hash_command(target_ms):
+    ''' Print PBKDF2 cost hitting the target latency here '''
+    click.echo('PASSWORD_HASH_METHOD=pbkdf2:sha256:{}'.format(
+        calibrate(target_ms)))
+
+
+@click.command('reconcile-reviews-count')
+@click.option('--batch-size', type=int, default=500,
+              help='Businesses checked per batch')
+@with_appcontext
+def reconcile_reviews_count_command(batch_size):
+    ''' Repair stored business reviews counts '''
+    click.echo('Fixed reviews count of {} businesses'.format(
+        Business.reconcile_reviews_counts(batch_size)))
+
+
+@click.command('estimate-search-indexes')
+@with_appcontext
+def estimate_search_indexes_command():
+    '''
+        Build the in-process search indexes in this process and print
+        their size and build time. Serving processes are not changed,
+        they rebuild their own every SEARCH_INDEX_REBUILD_INTERVAL
+    '''
+    started = time.perf_counter()
+    build_search_index()
+    click.echo('Indexed {documents} businesses, {terms} terms, {postings} '
+               'postings ({postings_bytes} bytes) in {seconds:.2f}s'.format(
+                   seconds=time.perf_counter() - started,
+                   **search_index.stats()))
+    started = time.perf_counter()
+    build_fuzzy_index()
+    stats = fuzzy_index.stats()
+    click.echo('Indexed {name_words} name, {category_words} category and '
+               '{city_words} city words for fuzzy search ({bytes} bytes) '
+               'in {seconds:.2f}s'.format(
+                   seconds=time.perf_counter() - started, **stats))
+    started = time.perf_counter()
+    build_suggest_index()
+    click.echo('Indexed {values} suggestions under {keys} keys in '
+               '{seconds:.2f}s'.format(seconds=time.perf_counter() - started,
+                                       **suggest_index.stats()))
+
+
+COMMANDS = [
+    reap_tokens_command,
+    calibrate_password_hash_command,
+    reconcile_reviews_count_command,
+    estimate_search_indexes_command,
+]
+
+
+def register_commands(app):
+    ''' Register CLI commands on the app '''
+    for command in COMMANDS:
+        app.cli.add_command(command)
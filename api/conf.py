@@ -1,4 +1,29 @@
 from flask_mail import Mail
+from api.cache import TTLCache, ResponseCache
+from api.passwords import PasswordHasher
+from api.limiter import SlidingWindowLimiter
+from api.search.index import InvertedIndex
+from api.search.fuzzy import FuzzyIndex
+from api.search.suggest import SuggestIndex
 
 # Init Flask mail
 mail = Mail()
+# Verified access tokens keyed by token digest
+token_cache = TTLCache('TOKEN_CACHE', maxsize=4096, ttl=300)
+# Review authors usernames keyed by user id
+username_cache = TTLCache('USERNAME_CACHE', maxsize=4096, ttl=3600)
+# Public business pages keyed by route and query, tagged by business id
+response_cache = ResponseCache('RESPONSE_CACHE', maxsize=1024, ttl=60)
+# Exact businesses listing totals keyed by search filters
+count_cache = TTLCache('COUNT_CACHE', maxsize=1024, ttl=300)
+# Businesses search index of SEARCH_BACKEND = 'memory'
+search_index = InvertedIndex()
+# Words of business names, categories and cities for match=fuzzy
+fuzzy_index = FuzzyIndex()
+# Popular names, categories, cities and countries for typeahead
+suggest_index = SuggestIndex()
+# Password hashing worker pool
+hasher = PasswordHasher()
+# Failed login attempts per email and per client address
+login_email_limiter = SlidingWindowLimiter('LOGIN_EMAIL_RATE')
+login_ip_limiter = SlidingWindowLimiter('LOGIN_IP_RATE')
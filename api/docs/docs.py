@@ -630,7 +630,17 @@ GET_BUSINESSES_DOCS = {
         {
             "name": "limit",
             "in": "query",
-            "description": "Businesses limit per page",
+            "description": "Businesses limit per page, at most 100",
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
+        },
+        {
+            "name": "cursor",
+            "in": "query",
+            "description": ("next_cursor of the previous page, send it empty "
+                            "to get the first page. Replaces page"),
             "schema": {
                 "type": "string",
             },
@@ -644,6 +654,17 @@ GET_BUSINESSES_DOCS = {
                 "type": "string",
             },
             "required": False,
+        },
+        {
+            "name": "fields",
+            "in": "query",
+            "description": ("Comma separated business fields to return: id, "
+                            "user_id, name, description, category, country, "
+                            "city, reviews_count, created_at"),
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
         }
     ],
     "responses": {
@@ -764,7 +785,41 @@ GET_ALL_BUSINESSES_DOCS = {
         {
             "name": "limit",
             "in": "query",
-            "description": "Businesses limit per page",
+            "description": "Businesses limit per page, at most 100",
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
+        },
+        {
+            "name": "cursor",
+            "in": "query",
+            "description": ("next_cursor of the previous page, send it empty "
+                            "to get the first page. Replaces page"),
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
+        },
+        {
+            "name": "match",
+            "in": "query",
+            "description": ("substring (default), similar: typo tolerant "
+                            "search ordered by similarity, on PostgreSQL "
+                            "9.6+, "
+                            "or fuzzy: misspelled words of names, "
+                            "categories and cities are corrected"),
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
+        },
+        {
+            "name": "count",
+            "in": "query",
+            "description": ("exact (default) or estimate: fill "
+                            "total_businesses and pages from a cached count "
+                            "or the database estimate, see total_exact"),
             "schema": {
                 "type": "string",
             },
@@ -778,6 +833,17 @@ GET_ALL_BUSINESSES_DOCS = {
                 "type": "string",
             },
             "required": False,
+        },
+        {
+            "name": "fields",
+            "in": "query",
+            "description": ("Comma separated business fields to return: id, "
+                            "user_id, name, description, category, country, "
+                            "city, reviews_count, created_at"),
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
         }
     ],
     "responses": {
@@ -859,6 +925,17 @@ GET_BUSINESS_DOCS = {
                 "format": "uuid",
             },
             "required": True,
+        },
+        {
+            "name": "fields",
+            "in": "query",
+            "description": ("Comma separated business fields to return: id, "
+                            "user_id, name, description, category, country, "
+                            "city, reviews_count, created_at"),
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
         }
     ],
     "responses": {
@@ -925,6 +1002,72 @@ GET_BUSINESS_DOCS = {
     }
 }
 
+SUGGEST_BUSINESSES_DOCS = {
+    "tags": [
+        "Business"
+    ],
+    "description": ("Typeahead suggestions: most popular business names, "
+                    "categories, cities and countries with a word "
+                    "starting with a text"),
+    "parameters": [
+        {
+            "name": "q",
+            "in": "query",
+            "description": "Typed text, accents and case are ignored",
+            "schema": {
+                "type": "string",
+            },
+            "required": True,
+        },
+        {
+            "name": "limit",
+            "in": "query",
+            "description": "Number of suggestions, at most 20 (default 10)",
+            "schema": {
+                "type": "integer",
+            },
+            "required": False,
+        }
+    ],
+    "responses": {
+        "200": {
+            "description": ("Return response status "
+                            "and the suggestions"),
+            "schema": {
+                "id": "suggest_businesses_response",
+                "properties": {
+                    "status": {
+                        "type": "string",
+                        "example": "ok"
+                    },
+                    "suggestions": {
+                        "type": "array",
+                        "items": {
+                            "properties": {
+                                "field": {
+                                    "type": "string",
+                                    "example": "city"
+                                },
+                                "value": {
+                                    "type": "string",
+                                    "example": "Kigali"
+                                },
+                                "businesses": {
+                                    "type": "integer",
+                                    "example": 12
+                                },
+                            }
+                        }
+                    },
+                }
+            },
+        },
+        "503": {
+            "description": "The suggestions index is still being built",
+        }
+    }
+}
+
 DELETE_BUSINESS_DOCS = {
     "tags": [
         "Business"
@@ -982,6 +1125,16 @@ BUSINESS_REVIEWS_DOCS = {
                 "format": "uuid",
             },
             "required": True,
+        },
+        {
+            "name": "fields",
+            "in": "query",
+            "description": ("Comma separated review fields to return: id, "
+                            "user, description, created_at"),
+            "schema": {
+                "type": "string",
+            },
+            "required": False,
         }
     ],
     "responses": {
@@ -1,57 +1,157 @@
 '''
     Helper Methods
 '''
+import hashlib
+import json
 import secrets
+from collections import OrderedDict
+from functools import lru_cache
 from flask_mail import Message
 from hashids import Hashids
 from itsdangerous import (TimedJSONWebSignatureSerializer
-                          as Serializer, BadSignature, SignatureExpired)
+                          as Serializer, BadSignature, SignatureExpired,
+                          base64_decode)
 from flask import current_app as app
 from api.conf import mail
 
 
-def get_token(user_id, expires_in=3600, key=None):
+def key_id(key):
     '''
-        Generate token helper function
+        Public identifier of a signing key, sent in token headers
+    '''
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    return hashlib.sha256(key).hexdigest()[:8]
+
+
+@lru_cache(maxsize=32)
+def signer(key, expires_in=3600):
+    '''
+        Pre-built token serializer per key and lifetime
+    '''
+    return Serializer(key, expires_in)
+
+
+@lru_cache(maxsize=8)
+def _key_ring(keys):
+    ''' Verifying serializers by key id, current key first '''
+    return OrderedDict((key_id(key), signer(key)) for key in keys)
+
+
+def key_ring():
+    '''
+        Serializers of SECRET_KEY and RETIRED_SECRET_KEYS by key id
+    '''
+    return _key_ring((app.config['SECRET_KEY'],) + tuple(
+        app.config.get('RETIRED_SECRET_KEYS', ())))
+
+
+def sign(data, expires_in, key=None):
+    '''
+        Sign data with the key id in the token header
     '''
     if key is None:
         key = app.config['SECRET_KEY']
-    token = Serializer(key, expires_in)
-    token_with_id = token.dumps({'id': user_id})
-    return token_with_id.decode('ascii')
+    return signer(key, expires_in).dumps(
+        data, header_fields={'kid': key_id(key)}).decode('ascii')
 
 
-def token_id(token):
+def token_signers(token):
     '''
-        Check token if token is valid this returns ID aapended to it
+        Serializers able to verify the token, picked by its key id.
+        Tokens issued before key ids are tried against every key
     '''
-    deserialize_token = Serializer(app.config['SECRET_KEY'])
+    ring = key_ring()
     try:
-        data = deserialize_token.loads(token)
-    except SignatureExpired:
-        return False  # valid token, but expired
-    except BadSignature:
-        return False  # invalid token
-    return data['id']
+        header = json.loads(base64_decode(token.split('.', 1)[0]))
+    except Exception:  # pylint: disable=broad-except
+        return []
+    if not isinstance(header, dict) or 'kid' not in header:
+        return list(ring.values())
+    return [ring[header['kid']]] if header['kid'] in ring else []
+
+
+def get_token(user_id, expires_in=None, key=None):
+    '''
+        Generate token helper function, the random jti keeps tokens
+        issued within the same second unique
+    '''
+    if expires_in is None:
+        expires_in = app.config['TOKEN_EXPIRES_IN']
+    return sign({'id': user_id, 'jti': secrets.token_urlsafe(8)},
+                expires_in, key)
+
+
+def token_data(token):
+    '''
+        Verify token and return its user ID and expiry timestamp
+    '''
+    for deserialize_token in token_signers(token):
+        try:
+            data, header = deserialize_token.loads(token, return_header=True)
+        except SignatureExpired:
+            return False  # valid token, but expired
+        except BadSignature:
+            continue  # invalid token for this key
+        return data['id'], header['exp']
+    return False  # invalid token
+
+
+def token_digest(token):
+    '''
+        SHA-256 hex digest of a secret token
+    '''
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def hashids_codec(salt):
+    '''
+        Hashids codec, built once per salt
+    '''
+    return Hashids(salt=salt, min_length=34)
+
+
+@lru_cache(maxsize=4096)
+def _encode_id(salt, id_string):
+    ''' Memoized hashid encoding '''
+    return hashids_codec(salt).encode(id_string)
+
+
+@lru_cache(maxsize=4096)
+def _decode_id(salt, id_string):
+    ''' Memoized hashid decoding '''
+    f_id = hashids_codec(salt).decode(id_string)
+    if len(f_id) is not 0:
+        return f_id[0]
+    return None
 
 
 def hashid(id_string):
     '''
         Generate hashid
     '''
-    hash_id = Hashids(salt=app.config['SECRET_KEY'], min_length=34)
-    return hash_id.encode(id_string)
+    return _encode_id(app.config['SECRET_KEY'], id_string)
 
 
 def get_id(id_string):
     '''
         Get id from hashid
     '''
-    hash_id = Hashids(salt=app.config['SECRET_KEY'], min_length=34)
-    f_id = hash_id.decode(id_string)
-    if len(f_id) is not 0:
-        return f_id[0]
-    return None
+    return _decode_id(app.config['SECRET_KEY'], id_string)
+
+
+def parse_fields(value, allowed):
+    '''
+        Fields of a comma separated fields query argument, None when not
+        given and False when any of them is not allowed
+    '''
+    if value is None or value.strip() == '':
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    if not fields or not set(fields).issubset(allowed):
+        return False
+    return fields
 
 
 def generate_reset_token():
@@ -63,10 +163,7 @@ def get_confirm_email_token(expires_in=3600, key=None):
     '''
         Generate confirm link token
     '''
-    if key is None:
-        key = app.config['SECRET_KEY']
-    token = Serializer(key, expires_in)
-    return token.dumps({}).decode('ascii')
+    return sign({}, expires_in, key)
 
 
 def send_mail(email, body):
@@ -0,0 +1,176 @@
+'''
+    Sliding window rate limiting
+'''
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+
+
+class MemoryBackend():
+    '''
+        Per-process counters: key -> (window number, current, previous).
+        Least recently used keys are evicted past max_keys
+    '''
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, window):
+        ''' Counts of the current and previous window '''
+        with self._lock:
+            counter = self._counters.get(key)
+        return shift(counter, window)
+
+    def incr(self, key, window):
+        ''' Count one hit in the current window '''
+        with self._lock:
+            current, previous = shift(self._counters.get(key), window)
+            self._counters[key] = (window, current + 1, previous)
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+
+    def reset(self, key):
+        ''' Forget key counters '''
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def clear(self):
+        ''' Forget all counters '''
+        with self._lock:
+            self._counters.clear()
+
+
+class SQLiteBackend():
+    '''
+        Counters in a local SQLite file shared by worker processes. Each
+        limiter has its own table since window numbers depend on its
+        period
+    '''
+
+    def __init__(self, path, table='rate_limits'):
+        self.path = path
+        self.table = table
+        with self.transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS {0} ('
+                         'key TEXT PRIMARY KEY, window INTEGER, '
+                         'current INTEGER, previous INTEGER)'.format(table))
+            conn.execute('CREATE INDEX IF NOT EXISTS {0}_window '
+                         'ON {0} (window)'.format(table))
+
+    @contextmanager
+    def transaction(self):
+        ''' Short write transaction on a new connection '''
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get(self, key, window):
+        ''' Counts of the current and previous window '''
+        with self.transaction() as conn:
+            counter = conn.execute(
+                'SELECT window, current, previous FROM {} '
+                'WHERE key = ?'.format(self.table), (key,)).fetchone()
+        return shift(counter, window)
+
+    def incr(self, key, window):
+        ''' Count one hit in the current window '''
+        with self.transaction() as conn:
+            current, previous = shift(conn.execute(
+                'SELECT window, current, previous FROM {} '
+                'WHERE key = ?'.format(self.table), (key,)).fetchone(), window)
+            conn.execute('INSERT OR REPLACE INTO {} '
+                         'VALUES (?, ?, ?, ?)'.format(self.table),
+                         (key, window, current + 1, previous))
+            # Counters older than the previous window no longer count
+            conn.execute('DELETE FROM {} WHERE window < ?'.format(
+                self.table), (window - 1,))
+
+    def reset(self, key):
+        ''' Forget key counters '''
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM {} WHERE key = ?'.format(
+                self.table), (key,))
+
+    def clear(self):
+        ''' Forget all counters '''
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM {}'.format(self.table))
+
+
+def shift(counter, window):
+    '''
+        Move stored (window, current, previous) counts to a given window
+    '''
+    if counter is None or counter[0] < window - 1:
+        return 0, 0
+    if counter[0] == window - 1:
+        return 0, counter[1]
+    return counter[1], counter[2]
+
+
+class SlidingWindowLimiter():
+    '''
+        Approximate sliding window: the previous window count is weighted
+        by how much of it still overlaps the sliding window
+    '''
+
+    def __init__(self, config_prefix):
+        self.config_prefix = config_prefix
+        self.limit = 0
+        self.period = 60
+        self.backend = MemoryBackend()
+
+    def init_app(self, app):
+        '''
+            Load <PREFIX>_LIMIT, <PREFIX>_PERIOD and <PREFIX>_STORAGE
+            configs. Shared counters are kept, other workers use them
+        '''
+        self.limit = app.config[self.config_prefix + '_LIMIT']
+        self.period = app.config[self.config_prefix + '_PERIOD']
+        storage = app.config.get(self.config_prefix + '_STORAGE')
+        if storage:
+            self.backend = SQLiteBackend(
+                storage, 'rate_limits_' + self.config_prefix.lower())
+        else:
+            self.backend = MemoryBackend()
+
+    def count(self, key, now=None):
+        ''' Hits of key in the sliding window '''
+        now = time.time() if now is None else now
+        window, elapsed = divmod(now, self.period)
+        current, previous = self.backend.get(key, int(window))
+        return current + previous * (1 - elapsed / self.period)
+
+    def retry_after(self, keys, now=None):
+        '''
+            Seconds to wait when any key is over the limit, otherwise 0
+        '''
+        if self.limit <= 0:
+            return 0
+        now = time.time() if now is None else now
+        if any(self.count(key, now) >= self.limit for key in keys):
+            return math.ceil(self.period - now % self.period)
+        return 0
+
+    def hit(self, keys, now=None):
+        ''' Count one hit for every key '''
+        now = time.time() if now is None else now
+        for key in keys:
+            self.backend.incr(key, int(now // self.period))
+
+    def reset(self, key):
+        ''' Forget key hits '''
+        self.backend.reset(key)
@@ -0,0 +1,59 @@
+'''
+    Periodic logging of the serving process caches and pools counters
+'''
+import logging
+import time
+from threading import Thread
+from api.conf import (token_cache, username_cache, response_cache,
+                      count_cache, hasher, search_index, fuzzy_index,
+                      suggest_index)
+from api.reaper import REAPER_STATS
+
+logger = logging.getLogger(__name__)
+
+
+def process_stats():
+    '''
+        Counters of the in-process caches, hashing pool, reaper and
+        search indexes of this process
+    '''
+    return {
+        'token_cache': token_cache.stats(),
+        'username_cache': username_cache.stats(),
+        'response_cache': response_cache.stats(),
+        'count_cache': count_cache.stats(),
+        'password_hasher': hasher.stats(),
+        'reaper': dict(REAPER_STATS),
+        'search_index': search_index.stats(),
+        'fuzzy_index': fuzzy_index.stats(),
+        'suggest_index': suggest_index.stats(),
+    }
+
+
+def start_stats_logger(app):
+    '''
+        Log process_stats every STATS_LOG_INTERVAL seconds in a daemon
+        thread, the counters only exist in the serving process
+    '''
+    interval = app.config.get('STATS_LOG_INTERVAL', 0)
+    if interval <= 0 or 'stats_logger' in app.extensions:
+        return None
+    # Counters are logged at info level, shown even without a logging setup
+    logger.setLevel(logging.INFO)
+    if not logging.getLogger().handlers:
+        logger.addHandler(logging.StreamHandler())
+
+    def run():
+        ''' Logger loop '''
+        while True:
+            time.sleep(interval)
+            try:
+                for name, stats in process_stats().items():
+                    logger.info('%s %s', name, stats)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Stats logging failed')
+
+    thread = Thread(target=run, name='stats-logger', daemon=True)
+    app.extensions['stats_logger'] = thread
+    thread.start()
+    return thread
@@ -1,2 +1,25 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import set_committed_value
+from api.helpers import hashid
 db = SQLAlchemy()
+
+
+class PublicIdMixin():
+    '''
+        Stored hashid exposed in the API instead of the primary key
+    '''
+    public_id = db.Column(db.String(64), unique=True, index=True,
+                          nullable=True)
+
+
+@event.listens_for(PublicIdMixin, 'after_insert', propagate=True)
+def assign_public_id(mapper, connection, target):
+    '''
+        Fill public id once the primary key is known
+    '''
+    public_id = hashid(target.id)
+    table = mapper.local_table
+    connection.execute(table.update().where(
+        table.c.id == target.id).values(public_id=public_id))
+    set_committed_value(target, 'public_id', public_id)
@@ -1,14 +1,47 @@
 ''' User Model '''
-from sqlalchemy import func
-from api.models import db
+from flask import current_app as app
+from sqlalchemy import func, event, or_, DDL
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import column_property, object_session, undefer
+from api.models import db, PublicIdMixin
 from api.models.review import Review
+from api.models.listing_version import ListingVersion
+from api.models.user import User
 from api.helpers import hashid, get_id
+from api.conf import (response_cache, count_cache, search_index,
+                      fuzzy_index, suggest_index)
+from api.search import fold
 
 
-class Business(db.Model):
+# Business fields exposed by the API
+BUSINESS_FIELDS = ('id', 'user_id', 'name', 'description', 'category',
+                   'country', 'city', 'reviews_count', 'created_at')
+# Fields searched through their folded `<field>_key` copy
+KEY_FIELDS = ('name', 'category', 'city', 'country')
+# Full text search weight of each business field
+SEARCH_WEIGHTS = (('name', 'A'), ('category', 'B'), ('city', 'C'),
+                  ('country', 'C'), ('description', 'D'))
+
+
+class Business(PublicIdMixin, db.Model):
     '''Business Model'''
 
     __tablename__ = "businesses"
+    # Keyset pagination order
+    __table_args__ = (
+        db.Index('ix_businesses_created_at_id', 'created_at', 'id'),
+        db.Index('ix_businesses_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+    ) + tuple(
+        # Substring and similarity search (pg_trgm)
+        db.Index('ix_businesses_{}_key_trgm'.format(field), field + '_key',
+                 postgresql_using='gin',
+                 postgresql_ops={field + '_key': 'gin_trgm_ops'})
+        for field in KEY_FIELDS) + tuple(
+        # Equality filters of a user businesses
+        db.Index('ix_businesses_user_id_{}_key'.format(field), 'user_id',
+                 field + '_key')
+        for field in KEY_FIELDS)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(180), index=False, nullable=False)
@@ -16,73 +49,223 @@ class Business(db.Model):
     country = db.Column(db.String(128), index=False, nullable=False)
     city = db.Column(db.String(128), index=False, nullable=False)
     category = db.Column(db.String(128), index=False, nullable=False)
+    # Maintained by Review.save and Review.delete_all
+    reviews_count = db.Column(db.Integer, default=0, server_default='0',
+                              index=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Owner public id as listings return it, loaded by get
+    user_public_id = column_property(
+        db.select([User.public_id]).where(User.id == user_id)
+        .correlate_except(User).as_scalar(), deferred=True)
     created_at = db.Column(
         db.DateTime, default=db.func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, default=db.func.now(),
-                           server_onupdate=db.func.now(), nullable=False)
+                           onupdate=db.func.now(), nullable=False)
+    # Folded (see api.search.fold) copies of KEY_FIELDS compared by
+    # searches, written by update_search_keys
+    name_key = db.Column(db.Text, nullable=False)
+    category_key = db.Column(db.Text, nullable=False)
+    city_key = db.Column(db.Text, nullable=False)
+    country_key = db.Column(db.Text, nullable=False)
+    # Weighted full text document, only filled on PostgreSQL
+    search_vector = db.Column(
+        TSVECTOR().with_variant(db.Text(), 'sqlite'), nullable=True)
 
     def hashid(self):
         '''
             Generate hashid
         '''
-        return hashid(self.id)
+        return self.public_id or hashid(self.id)
+
+    @classmethod
+    def _id_filter(cls, business_id):
+        '''
+            Filter on the business with this public id. Links issued
+            before public ids were stored carry the hashid of the id
+        '''
+        found_id = get_id(business_id)
+        if found_id is None:
+            return cls.public_id == business_id
+        return or_(cls.public_id == business_id, cls.id == found_id)
 
     @classmethod
     def get(cls, business_id):
         '''
             Get business by hashid
         '''
-        found_id = get_id(business_id)
-        if found_id is not None:
-            return cls.query.get(found_id)
+        return cls.query.options(undefer('user_public_id')).filter(
+            cls._id_filter(business_id)).first()
+
+    @classmethod
+    def search_rows(cls):
+        '''
+            Stream (id, name, category, city, country, description) of
+            every business for the search index
+        '''
+        return db.session.query(
+            cls.id, cls.name, cls.category, cls.city, cls.country,
+            cls.description).yield_per(1000)
 
     @classmethod
-    def serializer(cls, datum):
+    def fuzzy_rows(cls):
         '''
-            Serialize model object array (Convert into a list
+            Stream (name, category, city) of every business for the
+            fuzzy search index
         '''
-        results = []
-        for data in datum:
-            obj = {
-                'id': hashid(data.id),
-                'user_id': hashid(data.user_id),
-                'name': data.name,
-                'description': data.description,
-                'category': data.category,
-                'country': data.country,
-                'city': data.city,
-                'reviews_count': Review.query.filter_by(
-                    business_id=data.id
-                ).count(),
-                'created_at': data.created_at,
-            }
-            results.append(obj)
-        return results
+        return db.session.query(
+            cls.name, cls.category, cls.city).yield_per(1000)
+
+    @classmethod
+    def suggest_rows(cls):
+        '''
+            Stream (name, category, city, country) of every business for
+            the suggestions index
+        '''
+        return db.session.query(
+            cls.name, cls.category, cls.city, cls.country).yield_per(1000)
+
+    def suggest_values(self):
+        '''
+            Suggested fields of the business, in suggest_rows order
+        '''
+        return (self.name, self.category, self.city, self.country)
+
+    def search_values(self):
+        '''
+            Indexed fields of the business, in search_rows order
+        '''
+        return (self.name, self.category, self.city, self.country,
+                self.description)
+
+    @classmethod
+    def search_key(cls, column):
+        '''
+            Folded copy of a searched column
+        '''
+        return getattr(cls, column.key + '_key')
+
+    @classmethod
+    def primary_key(cls, business_id):
+        '''
+            Numeric id of the business with this hashid
+        '''
+        return db.session.query(cls.id).filter(
+            cls._id_filter(business_id)).limit(1).scalar()
+
+    @classmethod
+    def version(cls, business_id):
+        '''
+            (updated_at, reviews_count, last review id) of the business
+            with this hashid, they change whenever its pages change
+        '''
+        last_review_id = db.session.query(func.max(Review.id)).filter(
+            Review.business_id == cls.id).correlate(cls).as_scalar()
+        query = db.session.query(
+            cls.updated_at, cls.reviews_count, last_review_id)
+        return query.filter(cls._id_filter(business_id)).first()
+
+    @classmethod
+    def reviews_counts(cls, business_ids):
+        '''
+            Reviews count of every business id in one grouped query
+        '''
+        if not business_ids:
+            return {}
+        return dict(db.session.query(
+            Review.business_id, func.count(Review.id)
+        ).filter(Review.business_id.in_(business_ids)).group_by(
+            Review.business_id))
+
+    @classmethod
+    def reconcile_reviews_counts(cls, batch_size=500):
+        '''
+            Recompute stored reviews counts in batches, return fixed rows
+        '''
+        fixed = 0
+        last_id = 0
+        while True:
+            batch = db.session.query(cls.id, cls.reviews_count).filter(
+                cls.id > last_id).order_by(cls.id).limit(batch_size).all()
+            if not batch:
+                return fixed
+            counts = cls.reviews_counts([row.id for row in batch])
+            for row in batch:
+                if row.reviews_count != counts.get(row.id, 0):
+                    cls.query.filter_by(id=row.id).update(
+                        {'reviews_count': counts.get(row.id, 0)},
+                        synchronize_session=False)
+                    fixed += 1
+            if fixed:
+                ListingVersion.changed()
+            db.session.commit()
+            last_id = batch[-1].id
+
+    @classmethod
+    def listing_columns(cls, fields=None):
+        '''
+            Labelled columns of the requested fields, in response order
+        '''
+        columns = {
+            'id': cls.public_id.label('id'),
+            'user_id': User.public_id.label('user_id'),
+            'name': cls.name,
+            'description': cls.description,
+            'category': cls.category,
+            'country': cls.country,
+            'city': cls.city,
+            'reviews_count': cls.reviews_count,
+            'created_at': cls.created_at,
+        }
+        return [columns[field] for field in BUSINESS_FIELDS
+                if fields is None or field in fields]
+
+    @classmethod
+    def listing(cls, fields=None):
+        '''
+            Query of plain column tuples of the requested fields
+        '''
+        query = db.session.query(
+            *cls.listing_columns(fields)).select_from(cls)
+        if fields is None or 'user_id' in fields:
+            query = query.join(User, User.id == cls.user_id)
+        return query
+
+    @classmethod
+    def find_row(cls, business_id, fields=None):
+        '''
+            Get business requested fields tuple by hashid
+        '''
+        return cls.listing(fields).filter(
+            cls._id_filter(business_id)).first()
+
+    @staticmethod
+    def serialize_rows(rows):
+        '''
+            Convert listing rows to dictionaries
+        '''
+        if not rows:
+            return []
+        keys = rows[0]._fields
+        return [dict(zip(keys, row)) for row in rows]
 
     @classmethod
     def get_by_user(cls, business_id, user_id):
         ''' Get user businesses '''
-        found_business_id = get_id(business_id)
-        if get_id(business_id) is not None:
-            return cls.query.filter_by(
-                user_id=user_id, id=found_business_id
-            ).first()
+        return cls.query.filter(
+            cls.user_id == user_id, cls._id_filter(business_id)).first()
 
     @classmethod
     def serialize_obj(cls, data):
         ''' Convert model object to dictionary '''
         return {
-            'id': hashid(data.id),
-            'user_id': hashid(data.user_id),
+            'id': data.public_id,
+            'user_id': data.user_public_id,
             'name': data.name,
             'description': data.description,
             'category': data.category,
             'country': data.country,
             'city': data.city,
-            'reviews_count': Review.query.filter_by(
-                business_id=data.id
-            ).count(),
+            'reviews_count': data.reviews_count,
             'created_at': data.created_at,
         }
 
@@ -92,16 +275,17 @@ class Business(db.Model):
             Check if the user has the two same busines name #nt
             from the one to update
         '''
-        if cls.query.filter(cls.user_id == user_id, func.lower(
-                cls.name) == func.lower(business_name),
-                cls.id != get_id(business_id)).first() is not None:
+        if cls.query.filter(cls.user_id == user_id,
+                            cls.name_key == fold(business_name),
+                            cls.id != business_id).first() is not None:
             return True
         return False
 
     @classmethod
     def update(cls, business_id, data):
         ''' Update business'''
-        business = cls.query.filter_by(id=get_id(business_id)).first()
+        business = cls.query.get(business_id)
+        previous = business.suggest_values()
         business.name = data['name']
         business.description = data['description']
         business.category = data['category']
@@ -109,6 +293,12 @@ class Business(db.Model):
         business.country = data['country']
         db.session.add(business)
         db.session.commit()
+        response_cache.invalidate(business_id)
+        count_cache.clear()
+        search_index.add(business.id, business.search_values())
+        fuzzy_index.add((business.name, business.category, business.city))
+        suggest_index.remove(previous)
+        suggest_index.add(business.suggest_values())
 
     @classmethod
     def save(cls, data):
@@ -125,6 +315,10 @@ class Business(db.Model):
         )
         db.session.add(business)
         db.session.commit()
+        count_cache.clear()
+        search_index.add(business.id, business.search_values())
+        fuzzy_index.add((business.name, business.category, business.city))
+        suggest_index.add(business.suggest_values())
 
     @classmethod
     def delete(cls, business_id):
@@ -134,3 +328,56 @@ class Business(db.Model):
         business = cls.query.get(business_id)
         db.session.delete(business)
         db.session.commit()
+        response_cache.invalidate(business_id)
+        count_cache.clear()
+        search_index.remove(business_id)
+        suggest_index.remove(business.suggest_values())
+
+
+def search_document(business):
+    '''
+        Weighted tsvector expression of the business searchable fields
+    '''
+    config = app.config['SEARCH_TSCONFIG']
+    document = None
+    for field, weight in SEARCH_WEIGHTS:
+        vector = func.setweight(func.to_tsvector(
+            config, getattr(business, field) or ''), weight)
+        document = vector if document is None else document.op('||')(vector)
+    return document
+
+
+# Trigram indexes need the extension, migrations enable it too
+event.listen(Business.__table__, 'before_create', DDL(
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(
+        dialect='postgresql'))
+
+
+@event.listens_for(Business, 'before_insert')
+@event.listens_for(Business, 'before_update')
+def update_search_vector(mapper, connection, target):
+    '''
+        Rebuild the search document in the same INSERT/UPDATE statement
+    '''
+    if connection.dialect.name == 'postgresql':
+        target.search_vector = search_document(target)
+
+
+@event.listens_for(Business, 'before_insert')
+@event.listens_for(Business, 'before_update')
+def update_search_keys(mapper, connection, target):
+    '''
+        Fold the searched fields into their key columns
+    '''
+    for field in KEY_FIELDS:
+        setattr(target, field + '_key', fold(getattr(target, field)))
+
+
+@event.listens_for(Business, 'after_insert')
+@event.listens_for(Business, 'after_update')
+@event.listens_for(Business, 'after_delete')
+def bump_listing_version(mapper, connection, target):
+    '''
+        Every business write changes the listings
+    '''
+    ListingVersion.changed(object_session(target))
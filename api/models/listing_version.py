@@ -0,0 +1,64 @@
+''' Listings version Model '''
+from sqlalchemy import event, DDL
+from sqlalchemy.orm import Session
+from api.models import db
+
+
+class ListingVersion(db.Model):
+    '''
+        Single row counter bumped after every committed write that
+        changes businesses listings, their ETags derive from it. The bump
+        runs after the commit so writes never queue on the counter row
+    '''
+
+    __tablename__ = "listing_versions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, default=0, server_default='0',
+                        nullable=False)
+
+    @classmethod
+    def current(cls):
+        '''
+            Current listings version, a primary key lookup
+        '''
+        return db.session.query(cls.version).filter(cls.id == 1).scalar()
+
+    @classmethod
+    def changed(cls, session=None):
+        '''
+            Mark the listings changed by the session transaction, the
+            version is bumped once it commits
+        '''
+        (session or db.session).info['listings_changed'] = True
+
+    @classmethod
+    def bump(cls, bind):
+        '''
+            Change the listings version in a transaction of its own
+        '''
+        table = cls.__table__
+        bind.execute(table.update().where(
+            table.c.id == 1).values(version=table.c.version + 1))
+
+
+@event.listens_for(Session, 'after_commit')
+def bump_after_commit(session):
+    '''
+        Bump the listings version of committed listings changes
+    '''
+    if session.info.pop('listings_changed', False):
+        ListingVersion.bump(session.get_bind())
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_listings_changes(session):
+    '''
+        Rolled back changes leave the listings version alone
+    '''
+    session.info.pop('listings_changed', None)
+
+
+# The counter row, migrations insert it too
+event.listen(ListingVersion.__table__, 'after_create', DDL(
+    'INSERT INTO listing_versions (id, version) VALUES (1, 0)'))
@@ -1,5 +1,16 @@
 ''' Password reset Model '''
+from datetime import datetime, timedelta
+from flask import current_app as app
 from api.models import db
+from api.helpers import token_digest
+
+
+def reset_token_expiry():
+    '''
+        Reset links are valid for RESET_TOKEN_EXPIRES_IN seconds
+    '''
+    return datetime.utcnow() + timedelta(
+        seconds=app.config['RESET_TOKEN_EXPIRES_IN'])
 
 
 class PasswordReset(db.Model):
@@ -9,14 +20,36 @@ class PasswordReset(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    reset_token = db.Column(db.String, nullable=False)
+    reset_token_digest = db.Column(
+        db.String(64), unique=True, index=True, nullable=False)
     expires_at = db.Column(
-        db.DateTime, default=db.func.now(), nullable=False)
+        db.DateTime, default=reset_token_expiry, index=True, nullable=False)
     created_at = db.Column(
         db.DateTime, default=db.func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, default=db.func.now(),
                            server_onupdate=db.func.now(), nullable=False)
 
+    @property
+    def reset_token(self):
+        '''
+            Token given when creating the row, only its digest is stored
+        '''
+        return self.__dict__.get('_reset_token')
+
+    @reset_token.setter
+    def reset_token(self, reset_token):
+        self._reset_token = reset_token
+        self.reset_token_digest = token_digest(reset_token)
+
+    @classmethod
+    def get_by_token(cls, token):
+        '''
+            Get reset token row by its digest
+        '''
+        return cls.query.filter(
+            cls.reset_token_digest == token_digest(token),
+            cls.expires_at > datetime.utcnow()).first()
+
     @classmethod
     def save(cls, user_id, token):
         '''
@@ -1,10 +1,17 @@
 ''' Review Model '''
-from api.models import db
+from sqlalchemy import desc, event
+from sqlalchemy.orm import object_session
+from api.models import db, PublicIdMixin
 from api.models.user import User
-from api.helpers import hashid
+from api.models.listing_version import ListingVersion
+from api.conf import username_cache, response_cache
 
 
-class Review(db.Model):
+# Review fields exposed by the API
+REVIEW_FIELDS = ('id', 'user', 'description', 'created_at')
+
+
+class Review(PublicIdMixin, db.Model):
     '''Review Model'''
 
     __tablename__ = "reviews"
@@ -12,12 +19,12 @@ class Review(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(250), index=False, nullable=False)
     business_id = db.Column(db.Integer, db.ForeignKey(
-        'businesses.id'), nullable=False)
+        'businesses.id'), index=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(
         db.DateTime, default=db.func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, default=db.func.now(),
-                           server_onupdate=db.func.now(), nullable=False)
+                           onupdate=db.func.now(), nullable=False)
 
     @classmethod
     def save(cls, data):
@@ -30,29 +37,66 @@ class Review(db.Model):
             business_id=data['business_id']
         )
         db.session.add(review)
+        businesses = db.metadata.tables['businesses']
+        db.session.execute(businesses.update().where(
+            businesses.c.id == data['business_id']
+        ).values(reviews_count=businesses.c.reviews_count + 1))
         db.session.commit()
+        response_cache.invalidate(data['business_id'])
         return review
 
     @classmethod
-    def serializer(cls, datum):
-        ''' Serialize model object array (Convert into a list) '''
-        results = []
-        for data in datum:
-            obj = {
-                'id': hashid(data.id),
-                'user': User.query.get(data.user_id).username.capitalize(),
-                'description': data.description,
-                'created_at': data.created_at,
-            }
-            results.append(obj)
+    def get_business_reviews(cls, business_id, fields=None):
+        '''
+            Business reviews requested fields tuples, authors usernames
+            are joined in the same query
+        '''
+        columns = {
+            'id': cls.public_id.label('id'),
+            'user': User.username.label('user'),
+            'description': cls.description,
+            'created_at': cls.created_at,
+        }
+        query = db.session.query(*[
+            columns[field] for field in REVIEW_FIELDS
+            if fields is None or field in fields]).select_from(cls)
+        if fields is None or 'user' in fields:
+            query = query.join(User, User.id == cls.user_id)
+        return query.filter(cls.business_id == business_id).order_by(
+            desc(cls.created_at)).all()
+
+    @classmethod
+    def username(cls, user_id):
+        '''
+            Review author username, cached by user id
+        '''
+        username = username_cache.get(user_id)
+        if username is None:
+            username = db.session.query(User.username).filter(
+                User.id == user_id).scalar()
+            username_cache.set(user_id, username)
+        return username
+
+    @staticmethod
+    def serialize_rows(rows):
+        '''
+            Convert reviews rows to dictionaries
+        '''
+        if not rows:
+            return []
+        keys = rows[0]._fields
+        results = [dict(zip(keys, row)) for row in rows]
+        if 'user' in keys:
+            for obj in results:
+                obj['user'] = obj['user'].capitalize()
         return results
 
     @property
     def serialize_one(self):
         ''' Serialize model object array (Convert into a list) '''
         obj = {
-            'id': hashid(self.id),
-            'user': User.query.get(self.user_id).username.capitalize(),
+            'id': self.public_id,
+            'user': self.username(self.user_id).capitalize(),
             'description': self.description,
             'created_at': self.created_at,
         }
@@ -64,3 +108,17 @@ class Review(db.Model):
             Delete All reviews about business
         '''
         cls.query.filter_by(business_id=business_id).delete()
+        businesses = db.metadata.tables['businesses']
+        db.session.execute(businesses.update().where(
+            businesses.c.id == business_id).values(reviews_count=0))
+        ListingVersion.changed()
+        response_cache.invalidate(business_id)
+
+
+@event.listens_for(Review, 'after_insert')
+@event.listens_for(Review, 'after_delete')
+def bump_listing_version(mapper, connection, target):
+    '''
+        Reviews change the listed reviews counts
+    '''
+    ListingVersion.changed(object_session(target))
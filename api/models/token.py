@@ -1,5 +1,17 @@
 ''' Access tokens Model '''
+from datetime import datetime, timedelta
+from flask import current_app as app
 from api.models import db
+from api.conf import token_cache
+from api.helpers import token_digest
+
+
+def token_expiry():
+    '''
+        Access tokens expire with the signed token they store
+    '''
+    return datetime.utcnow() + timedelta(
+        seconds=app.config['TOKEN_EXPIRES_IN'])
 
 
 class Token(db.Model):
@@ -9,14 +21,35 @@ class Token(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    access_token = db.Column(db.String, nullable=False)
+    access_token_digest = db.Column(
+        db.String(64), unique=True, index=True, nullable=False)
     expires_at = db.Column(
-        db.DateTime, default=db.func.now(), nullable=False)
+        db.DateTime, default=token_expiry, index=True, nullable=False)
     created_at = db.Column(
         db.DateTime, default=db.func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, default=db.func.now(),
                            server_onupdate=db.func.now(), nullable=False)
 
+    @property
+    def access_token(self):
+        '''
+            Token given when creating the row, only its digest is stored
+        '''
+        return self.__dict__.get('_access_token')
+
+    @access_token.setter
+    def access_token(self, access_token):
+        self._access_token = access_token
+        self.access_token_digest = token_digest(access_token)
+
+    @classmethod
+    def get_by_token(cls, access_token):
+        '''
+            Get access token row by its digest
+        '''
+        return cls.query.filter_by(
+            access_token_digest=token_digest(access_token)).first()
+
     @classmethod
     def save(cls, data):
         '''
@@ -35,5 +68,7 @@ class Token(db.Model):
             Delete token
         '''
         token = Token.query.get(token_id)
+        digest = token.access_token_digest
         db.session.delete(token)
         db.session.commit()
+        token_cache.delete(digest)
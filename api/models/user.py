@@ -1,9 +1,11 @@
 ''' User Model '''
-from api.models import db
-from api.helpers import get_confirm_email_token
+from sqlalchemy.orm import validates
+from api.models import db, PublicIdMixin
+from api.conf import token_cache
+from api.helpers import get_confirm_email_token, token_digest
 
 
-class User(db.Model):
+class User(PublicIdMixin, db.Model):
     '''Users Model'''
 
     __tablename__ = "users"
@@ -13,12 +15,36 @@ class User(db.Model):
                          unique=True, nullable=False)
     email = db.Column(db.String(120), index=False, unique=True, nullable=False)
     activation_token = db.Column(db.String(128), nullable=True)
+    # Not unique: confirm tokens carry no user data and may repeat
+    activation_token_digest = db.Column(
+        db.String(64), index=True, nullable=True)
     password = db.Column(db.String(128), nullable=False)
     created_at = db.Column(
         db.DateTime, server_default=db.func.now(), nullable=False)
     updated_at = db.Column(db.DateTime, server_default=db.func.now(
     ), server_onupdate=db.func.now(), nullable=False)
 
+    @validates('activation_token')
+    def validate_activation_token(self, key, activation_token):
+        '''
+            Keep the indexed lookup digest in sync with the token
+        '''
+        self.activation_token_digest = (
+            None if activation_token is None
+            else token_digest(activation_token))
+        return activation_token
+
+    @classmethod
+    def get_by_activation_token(cls, token, email=None):
+        '''
+            Get unconfirmed user by activation token digest
+        '''
+        query = cls.query.filter_by(
+            activation_token_digest=token_digest(token))
+        if email is not None:
+            query = query.filter_by(email=email)
+        return query.first()
+
     @classmethod
     def save(cls, user):
         '''
@@ -49,6 +75,7 @@ class User(db.Model):
         user.password = password
         db.session.add(user)
         db.session.commit()
+        cls.forget_tokens(user_id)
 
     @classmethod
     def update_token(cls, user_id, token):
@@ -67,3 +94,11 @@ class User(db.Model):
         user.activation_token = None
         db.session.add(user)
         db.session.commit()
+        cls.forget_tokens(user_id)
+
+    @classmethod
+    def forget_tokens(cls, user_id):
+        '''
+            Drop cached access token verifications of the user
+        '''
+        token_cache.delete_where(lambda principal: principal[0] == user_id)
@@ -0,0 +1,166 @@
+'''
+    Keyset (cursor) pagination of listing queries
+'''
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app as app, abort
+from flask_sqlalchemy import Pagination
+from sqlalchemy import desc, func, tuple_
+from api.helpers import hashids_codec
+from api.models import db
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def page_size(per_page):
+    '''
+        Requested page size between 1 and MAX_PAGE_SIZE
+    '''
+    return max(1, min(per_page, app.config['MAX_PAGE_SIZE']))
+
+
+def cursor_codec():
+    '''
+        Hashids codec of cursors, salted apart from public ids
+    '''
+    return hashids_codec(app.config['SECRET_KEY'] + ':cursor')
+
+
+def encode_cursor(created_at, row_id):
+    '''
+        Opaque cursor of the (created_at, id) position of a row
+    '''
+    micros = (created_at - EPOCH) // timedelta(microseconds=1)
+    return cursor_codec().encode(micros, row_id)
+
+
+def decode_cursor(cursor):
+    '''
+        (created_at, id) position of a cursor, None when it is not valid
+    '''
+    values = cursor_codec().decode(cursor)
+    if len(values) != 2:
+        return None
+    return EPOCH + timedelta(microseconds=values[0]), values[1]
+
+
+def strip_columns(rows, count):
+    '''
+        Rows without their last count columns, keeping the column names
+    '''
+    if not rows:
+        return []
+    Row = namedtuple('Row', rows[0]._fields[:-count])
+    return [Row._make(row[:-count]) for row in rows]
+
+
+def window_paginate(query, page, per_page):
+    '''
+        Same page as Query.paginate, with the total read from a
+        count(*) over () window of the page query instead of a second
+        COUNT statement. Empty pages carry no total: an empty first page
+        has none and later ones are not found, like with paginate
+    '''
+    if page < 1:
+        abort(404)
+    rows = query.add_columns(func.count().over().label('total_count')) \
+        .limit(per_page).offset((page - 1) * per_page).all()
+    if rows:
+        total = rows[0][-1]
+    elif page != 1:
+        abort(404)
+    else:
+        total = 0
+    pagination = Pagination(
+        query, page, per_page, total, strip_columns(rows, 1))
+    pagination.total_exact = True
+    return pagination
+
+
+def ids_paginate(query, id_column, ids, page, per_page):
+    '''
+        Page of query following an ordered list of ids (search results),
+        only the rows of the page ids are loaded
+    '''
+    if page < 1:
+        abort(404)
+    page_ids = ids[(page - 1) * per_page:page * per_page]
+    if not page_ids and page != 1:
+        abort(404)
+    rows = []
+    if page_ids:
+        rows = query.add_columns(id_column.label('page_id')).filter(
+            id_column.in_(page_ids)).order_by(None).all()
+        order = {row_id: position for position, row_id in enumerate(page_ids)}
+        rows.sort(key=lambda row: order[row[-1]])
+    pagination = Pagination(
+        query, page, per_page, len(ids), strip_columns(rows, 1))
+    pagination.total_exact = True
+    return pagination
+
+
+def estimate_count(query):
+    '''
+        Planner estimate of the rows of query on PostgreSQL, None on
+        databases without one
+    '''
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return None
+    compiled = query.order_by(None).statement.compile(
+        dialect=connection.dialect)
+    plan = connection.execute(
+        'EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_paginate(query, page, per_page, total=None):
+    '''
+        Page of query whose total is the given exact total (a cached
+        count), or else the planner estimate, without counting rows. A
+        short page tells the exact total; without an estimate the rows
+        are counted. total_exact tells which one was used. Empty pages
+        after the first are not found, like with paginate
+    '''
+    if page < 1:
+        abort(404)
+    offset = (page - 1) * per_page
+    rows = query.limit(per_page).offset(offset).all()
+    if not rows and page != 1:
+        abort(404)
+    exact = total is not None
+    if len(rows) < per_page:
+        total, exact = offset + len(rows), True
+    elif total is None:
+        total = estimate_count(query)
+        if total is None:
+            total, exact = query.order_by(None).count(), True
+        else:
+            # Never announce fewer rows than already returned
+            total = max(total, offset + len(rows))
+    pagination = Pagination(query, page, per_page, total, rows)
+    pagination.total_exact = exact
+    return pagination
+
+
+def keyset_paginate(query, created_at, row_id, position, per_page):
+    '''
+        Rows of query following position, newest first, and the cursor
+        of the next page (None on the last page). The keyset columns are
+        selected after the requested ones and stripped from the rows, so
+        every page costs one index range scan whatever its depth
+    '''
+    query = query.add_columns(created_at.label('cursor_created_at'),
+                              row_id.label('cursor_id'))
+    if position is not None:
+        query = query.filter(tuple_(created_at, row_id) < tuple_(*position))
+    rows = query.order_by(None).order_by(
+        desc(created_at), desc(row_id)).limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(*rows[-1][-2:])
+    return strip_columns(rows, 2), next_cursor
@@ -0,0 +1,132 @@
+'''
+    Password hashing on a bounded worker pool
+'''
+import hashlib
+import os
+import time
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                TimeoutError as FutureTimeout)
+from threading import Lock
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    '''Raised when the hashing queue is full or a job times out'''
+
+
+class PasswordHasher():
+    '''
+        Run PBKDF2 hashing off the request threads on a size-limited pool
+    '''
+
+    def __init__(self):
+        self.method = 'pbkdf2:sha256:50000'
+        self.workers = 2
+        self.executor_type = 'thread'
+        self.queue_size = 4
+        self.timeout = 30
+        self._executor = None
+        self._lock = Lock()
+        self.pending = self.peak_pending = self.completed = self.rejected = 0
+        self.timed_out = 0
+
+    def init_app(self, app):
+        '''
+            Load pool settings from PASSWORD_HASH_* configs
+        '''
+        self.shutdown()
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.executor_type = app.config['PASSWORD_HASH_EXECUTOR']
+        self.queue_size = app.config['PASSWORD_HASH_QUEUE_SIZE']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+
+    def executor(self):
+        ''' Pool is created on first use, after any process fork '''
+        with self._lock:
+            if self._executor is None:
+                pool = (ProcessPoolExecutor if self.executor_type == 'process'
+                        else ThreadPoolExecutor)
+                self._executor = pool(max_workers=self.workers)
+            return self._executor
+
+    def shutdown(self):
+        ''' Stop the pool and reset counters '''
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self.pending = self.peak_pending = 0
+            self.completed = self.rejected = self.timed_out = 0
+
+    def run(self, func, *args):
+        '''
+            Run func on the pool, rejecting work when every worker is busy
+            and the queue is full or when it takes longer than timeout
+        '''
+        executor = self.executor()
+        with self._lock:
+            if self.pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            self._done(None)
+            raise
+        # Jobs stay pending until they really end, timed out ones too
+        future.add_done_callback(self._done)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise PasswordHasherBusy()
+
+    def _done(self, future):
+        ''' Count a job out of the pool '''
+        with self._lock:
+            self.pending -= 1
+            if future is not None and not future.cancelled():
+                self.completed += 1
+
+    def hash(self, password):
+        ''' Hash password with the configured method and cost '''
+        return self.run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        ''' Check password against stored hash '''
+        return self.run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        ''' Check if stored hash uses an outdated method or cost '''
+        return pwhash.split('$', 1)[0] != self.method
+
+    def stats(self):
+        ''' Queue depth metrics '''
+        with self._lock:
+            return {
+                'executor': self.executor_type,
+                'workers': self.workers,
+                'pending': self.pending,
+                'queued': max(self.pending - self.workers, 0),
+                'peak_pending': self.peak_pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
+
+
+def calibrate(target_ms, digest='sha256', sample_iterations=20000):
+    '''
+        PBKDF2 iterations taking about target_ms on this machine
+    '''
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac(digest, b'calibration', os.urandom(8),
+                        sample_iterations)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    iterations = int(sample_iterations * target_ms / elapsed_ms)
+    return max(1000, iterations // 1000 * 1000)
@@ -0,0 +1,83 @@
+'''
+    Expired access and password reset tokens reaper
+'''
+import logging
+import time
+from datetime import datetime
+from threading import Lock, Thread
+from api.models import db
+from api.models.token import Token
+from api.models.password_reset import PasswordReset
+
+logger = logging.getLogger(__name__)
+
+# Rows reclaimed since the process started
+REAPER_STATS = {
+    'runs': 0,
+    'access_tokens': 0,
+    'password_reset_tokens': 0,
+    'last_run_at': None,
+}
+_stats_lock = Lock()
+
+
+def reap_table(model, batch_size):
+    '''
+        Delete expired rows of a token table in bounded batches
+    '''
+    reclaimed = 0
+    while True:
+        expired_ids = [row.id for row in db.session.query(model.id).filter(
+            model.expires_at < datetime.utcnow()).limit(batch_size)]
+        if not expired_ids:
+            return reclaimed
+        model.query.filter(model.id.in_(expired_ids)).delete(
+            synchronize_session=False)
+        db.session.commit()
+        reclaimed += len(expired_ids)
+
+
+def reap_expired_tokens(batch_size=500):
+    '''
+        Delete expired tokens and return reclaimed rows per table
+    '''
+    reclaimed = {
+        'access_tokens': reap_table(Token, batch_size),
+        'password_reset_tokens': reap_table(PasswordReset, batch_size),
+    }
+    with _stats_lock:
+        REAPER_STATS['runs'] += 1
+        REAPER_STATS['access_tokens'] += reclaimed['access_tokens']
+        REAPER_STATS['password_reset_tokens'] += reclaimed[
+            'password_reset_tokens']
+        REAPER_STATS['last_run_at'] = datetime.utcnow()
+    logger.info('Reaped %(access_tokens)s access tokens and '
+                '%(password_reset_tokens)s password reset tokens', reclaimed)
+    return reclaimed
+
+
+def start_reaper(app):
+    '''
+        Run the reaper every TOKEN_REAPER_INTERVAL seconds in a daemon thread
+    '''
+    interval = app.config.get('TOKEN_REAPER_INTERVAL', 0)
+    if interval <= 0 or 'token_reaper' in app.extensions:
+        return None
+
+    def run():
+        ''' Reaper loop '''
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    reap_expired_tokens(app.config['TOKEN_REAPER_BATCH_SIZE'])
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception('Expired tokens reaper failed')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    thread = Thread(target=run, name='token-reaper', daemon=True)
+    app.extensions['token_reaper'] = thread
+    thread.start()
+    return thread
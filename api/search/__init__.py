@@ -0,0 +1,70 @@
+'''
+    Businesses search
+'''
+import time
+from threading import Lock, RLock
+from text_unidecode import unidecode
+
+
+def fold(text):
+    ''' Accent and case free form of a text, stored in search keys '''
+    return unidecode(text or '').lower()
+
+
+class RebuiltIndex():
+    '''
+        In-memory index loaded from the database rows, one build at a
+        time. Writes made while a build reads the rows are recorded and
+        replayed on the built content so none is lost. A write committed
+        just before the rows are read can be replayed on content having
+        it already: words indexes ignore it, a count may stay one off
+        until the next build
+    '''
+
+    def __init__(self):
+        self.ready = False
+        self.built_at = None
+        self._lock = RLock()
+        self._build_lock = Lock()
+        # Writes made during the running build
+        self._writes = None
+
+    def _load(self, rows):
+        ''' New content of rows, built without holding the lock '''
+        raise NotImplementedError
+
+    def _install(self, content):
+        ''' Replace the content, under the lock '''
+        raise NotImplementedError
+
+    def _apply(self, *write):
+        ''' Apply a write to the content, under the lock '''
+        raise NotImplementedError
+
+    def build(self, rows):
+        '''
+            Replace the content with rows, waiting for a running build
+            to end first
+        '''
+        with self._build_lock:
+            with self._lock:
+                self._writes = []
+            try:
+                content = self._load(rows)
+                with self._lock:
+                    self._install(content)
+                    for write in self._writes:
+                        self._apply(*write)
+                    self.ready = True
+                    self.built_at = time.time()
+            finally:
+                with self._lock:
+                    self._writes = None
+
+    def _write(self, *write):
+        ''' Apply a write, record it for the running build '''
+        with self._lock:
+            if self._writes is not None:
+                self._writes.append(write)
+            if self.ready:
+                self._apply(*write)
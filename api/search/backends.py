@@ -0,0 +1,243 @@
+'''
+    Businesses search backends
+'''
+import logging
+import time
+from threading import Thread
+from flask import current_app as app
+from sqlalchemy import func, and_, or_, literal, text
+from api.models import db
+from api.models.business import Business, SEARCH_WEIGHTS
+from api.conf import search_index, fuzzy_index, suggest_index
+from api.search import fold
+
+logger = logging.getLogger(__name__)
+# Seconds before retrying a failed indexes build, doubled up to the max
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 300
+# pg_trgm version of each database URL, word similarity needs 1.2
+# (PostgreSQL 9.6)
+TRIGRAM_VERSIONS = {}
+
+
+class LikeSearch():
+    '''
+        Accent and case insensitive substring search on the folded
+        search keys, scanned or served by their trigram indexes
+    '''
+
+    @staticmethod
+    def match(column, term):
+        ''' Column contains term '''
+        return Business.search_key(column).like('%' + fold(term) + '%')
+
+    @staticmethod
+    def rank(terms):
+        ''' Results keep the listing order '''
+        return None
+
+
+class FullTextSearch():
+    '''
+        PostgreSQL full text search over the weighted search_vector,
+        served by its GIN index
+    '''
+
+    @staticmethod
+    def query(term):
+        ''' tsquery of a search term '''
+        return func.plainto_tsquery(app.config['SEARCH_TSCONFIG'], term)
+
+    @classmethod
+    def match(cls, column, term):
+        '''
+            Column words match term: the document match uses the index,
+            the weights filter keeps only matches in that column weight
+        '''
+        query = cls.query(term)
+        weight = dict(SEARCH_WEIGHTS)[column.key]
+        return and_(
+            Business.search_vector.op('@@')(query),
+            func.ts_filter(Business.search_vector,
+                           '{' + weight.lower() + '}').op('@@')(query))
+
+    @classmethod
+    def rank(cls, terms):
+        ''' Rank of documents matching any of the terms '''
+        query = None
+        for term in terms:
+            term_query = cls.query(term)
+            query = term_query if query is None else query.op('||')(
+                term_query)
+        return func.ts_rank(Business.search_vector, query)
+
+
+# LIKE on the folded search keys is served by their pg_trgm GIN indexes
+# on PostgreSQL
+TrigramSearch = LikeSearch
+
+
+class TrigramSimilaritySearch():
+    '''
+        Typo tolerant search on PostgreSQL: a column matches when one of
+        its folded words is similar enough to the term (pg_trgm word
+        similarity, served by the same GIN indexes)
+    '''
+
+    @staticmethod
+    def match(column, term):
+        ''' Column has a word similar to term '''
+        return literal(fold(term)).op('<%')(Business.search_key(column))
+
+    @staticmethod
+    def rank(terms):
+        ''' Best word similarity of the terms in the searched fields '''
+        return func.greatest(*[
+            func.word_similarity(fold(term), column) for term in terms
+            for column in (Business.name_key, Business.category_key,
+                           Business.city_key, Business.country_key)])
+
+
+class MemorySearch(LikeSearch):
+    '''
+        In-process BM25 index (see api.search.index): listing pages ask
+        it for the ranked ids of the matches. Searches it does not serve,
+        cursor pages, use substring search
+    '''
+    index = search_index
+
+
+class FuzzySearch():
+    '''
+        Typo tolerant search on any database: every word of a term is
+        replaced by the indexed words within a few edits of it (see
+        api.search.fuzzy), searched with the configured backend so the
+        columns indexes still serve the filters. Terms are searched as
+        they are until the index is built
+    '''
+
+    @staticmethod
+    def match(column, term):
+        ''' Column contains a close word of every word of term '''
+        search = search_backend()
+        if column.key not in fuzzy_index.FIELDS or not fuzzy_index.ready:
+            return search.match(column, term)
+        expansions = fuzzy_index.expand(column.key, term)
+        if not expansions:
+            return search.match(column, term)
+        return and_(*[or_(*[search.match(column, word) for word in words])
+                      for words in expansions])
+
+    @staticmethod
+    def rank(terms):
+        ''' Results keep the listing order '''
+        return None
+
+
+BACKENDS = {
+    'like': LikeSearch,
+    'trigram': TrigramSearch,
+    'fulltext': FullTextSearch,
+    'memory': MemorySearch,
+}
+
+
+def word_similarity_supported():
+    '''
+        The PostgreSQL pg_trgm extension has word similarity, checked
+        once per database
+    '''
+    url = str(db.session.get_bind().url)
+    if url not in TRIGRAM_VERSIONS:
+        version = db.session.execute(text(
+            "SELECT extversion FROM pg_extension WHERE extname = 'pg_trgm'"
+        )).scalar()
+        TRIGRAM_VERSIONS[url] = tuple(
+            int(part) for part in version.split('.')) if version else ()
+    return TRIGRAM_VERSIONS[url] >= (1, 2)
+
+
+def search_backend(match=None):
+    '''
+        Search backend of a match mode: trigram similarity for 'similar'
+        on PostgreSQL 9.6+, corrected words for 'fuzzy', else the
+        configured backend ('auto' picks trigram search on PostgreSQL)
+    '''
+    if match == 'fuzzy':
+        return FuzzySearch
+    postgres = db.session.get_bind().dialect.name == 'postgresql'
+    if match == 'similar' and postgres and word_similarity_supported():
+        return TrigramSimilaritySearch
+    name = app.config['SEARCH_BACKEND']
+    if name == 'auto':
+        name = 'trigram' if postgres else 'like'
+    return BACKENDS[name]
+
+
+def build_search_index():
+    '''
+        Load every business in the in-process index
+    '''
+    search_index.build(Business.search_rows())
+    db.session.remove()
+
+
+def build_fuzzy_index():
+    '''
+        Load the words of every business in the fuzzy search index
+    '''
+    fuzzy_index.build(Business.fuzzy_rows())
+    db.session.remove()
+
+
+def build_suggest_index():
+    '''
+        Count the suggested values of every business
+    '''
+    suggest_index.build(Business.suggest_rows())
+    db.session.remove()
+
+
+def build_indexes(app):
+    '''
+        Build the in-process indexes, retried with a growing delay until
+        the database answers, then rebuilt every
+        SEARCH_INDEX_REBUILD_INTERVAL seconds (0 never)
+    '''
+    delay = RETRY_DELAY
+    while True:
+        try:
+            with app.app_context():
+                if app.config['SEARCH_BACKEND'] == 'memory':
+                    build_search_index()
+                build_fuzzy_index()
+                build_suggest_index()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Search indexes build failed, retrying in %ss',
+                             delay)
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+            continue
+        delay = RETRY_DELAY
+        if app.config['SEARCH_INDEX_REBUILD_INTERVAL'] <= 0:
+            return
+        time.sleep(app.config['SEARCH_INDEX_REBUILD_INTERVAL'])
+
+
+def init_search(app):
+    '''
+        Build the in-process indexes in a daemon thread started by the
+        first request, so CLI processes such as `flask db upgrade` never
+        run it. Searches use SQL until the memory index is built
+    '''
+    if not app.config['BUILD_SEARCH_INDEXES']:
+        return
+
+    @app.before_first_request
+    def start_index_builds():
+        ''' Start the indexes build in the serving process '''
+        if 'search_indexes' not in app.extensions:
+            thread = Thread(target=build_indexes, args=(app,),
+                            name='search-indexes', daemon=True)
+            app.extensions['search_indexes'] = thread
+            thread.start()
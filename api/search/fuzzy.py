@@ -0,0 +1,179 @@
+'''
+    Typo tolerant word lookup with n-gram indexes
+'''
+import sys
+from array import array
+from api.search import RebuiltIndex
+from api.search.index import tokenize
+
+
+def edit_distance(first, second):
+    ''' Levenshtein distance of two words '''
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for row, first_char in enumerate(first, 1):
+        current = [row]
+        for column, second_char in enumerate(second, 1):
+            current.append(min(previous[column] + 1, current[-1] + 1,
+                               previous[column - 1] +
+                               (first_char != second_char)))
+        previous = current
+    return previous[-1]
+
+
+def max_distance(word):
+    ''' Typos tolerated in a word of this length '''
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 6:
+        return 1
+    return 2
+
+
+def bigrams(word):
+    ''' Distinct letter pairs of a word padded at both ends '''
+    padded = '^' + word + '$'
+    return frozenset(padded[position:position + 2]
+                     for position in range(len(padded) - 1))
+
+
+class NgramIndex():
+    '''
+        Distinct words with posting arrays of word numbers per (word
+        length, bigram). One edit removes at most two bigrams of a word,
+        so a word within n edits of the searched one has one of the
+        nearby lengths and shares all but 2n of its bigrams: only those
+        candidates have their edit distance computed
+    '''
+
+    def __init__(self):
+        self.words = []
+        # bigrams of every word, by word number
+        self._grams = []
+        self._numbers = {}
+        self._postings = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word):
+        ''' Insert a word, known words are ignored '''
+        if word in self._numbers:
+            return
+        number = len(self.words)
+        self.words.append(word)
+        self._grams.append(bigrams(word))
+        self._numbers[word] = number
+        for gram in self._grams[number]:
+            self._postings.setdefault(
+                (len(word), gram), array('I')).append(number)
+
+    def find(self, word, tolerance):
+        ''' (distance, word) of the words within tolerance of word '''
+        if tolerance == 0:
+            return [(0, word)] if word in self._numbers else []
+        grams = bigrams(word)
+        threshold = len(grams) - 2 * tolerance
+        lengths = range(len(word) - tolerance, len(word) + tolerance + 1)
+        postings = sorted(
+            ([self._postings[(length, gram)] for length in lengths
+              if (length, gram) in self._postings] for gram in grams),
+            key=lambda arrays: sum(len(numbers) for numbers in arrays))
+        # A match misses at most 2 * tolerance bigrams, so it has one of
+        # the rarest 2 * tolerance + 1
+        candidates = set()
+        for arrays in postings[:2 * tolerance + 1]:
+            for numbers in arrays:
+                candidates.update(numbers)
+        found = []
+        for number in candidates:
+            if len(grams & self._grams[number]) >= threshold:
+                candidate = self.words[number]
+                distance = edit_distance(word, candidate)
+                if distance <= tolerance:
+                    found.append((distance, candidate))
+        return found
+
+    def size(self):
+        ''' Bytes of the words and postings '''
+        return sum(sys.getsizeof(word) for word in self.words) + sum(
+            postings.itemsize * len(postings)
+            for postings in self._postings.values())
+
+
+class FuzzyIndex(RebuiltIndex):
+    '''
+        N-gram indexes of the distinct words of business names,
+        categories and cities, used to expand misspelled search words
+        into the words really stored. Words of deleted or renamed
+        businesses stay until the next build, they only expand into
+        filters matching nothing more
+    '''
+
+    FIELDS = ('name', 'category', 'city')
+    # Largest number of corrections of one word
+    EXPANSIONS = 5
+
+    def __init__(self):
+        super().__init__()
+        self._indexes = {field: NgramIndex() for field in self.FIELDS}
+
+    def _load(self, rows):
+        ''' Indexes of the words of (name, category, city) rows '''
+        indexes = {field: NgramIndex() for field in self.FIELDS}
+        for row in rows:
+            for field, value in zip(self.FIELDS, row):
+                for word in self.words(value):
+                    indexes[field].add(word)
+        return indexes
+
+    def _install(self, content):
+        ''' Serve loaded indexes '''
+        self._indexes = content
+
+    def clear(self):
+        ''' Empty the indexes until the next build '''
+        with self._lock:
+            self._indexes = {field: NgramIndex() for field in self.FIELDS}
+            self.ready = False
+            self.built_at = None
+
+    def _apply(self, values):
+        ''' Index the words of one business, known words are ignored '''
+        for field, value in zip(self.FIELDS, values):
+            for word in self.words(value):
+                self._indexes[field].add(word)
+
+    def add(self, values):
+        ''' Index the words of (name, category, city) of one business '''
+        self._write(values)
+
+    @staticmethod
+    def words(value):
+        ''' Words worth correcting, numbers are left out '''
+        return [word for word in tokenize(value) if not word.isdigit()]
+
+    def expand(self, field, text):
+        '''
+            Closest indexed words of every word of text in field, the
+            word itself when nothing is close enough
+        '''
+        expansions = []
+        with self._lock:
+            index = self._indexes[field]
+            for word in tokenize(text):
+                found = sorted(index.find(word, max_distance(word)))
+                expansions.append([match for _, match in
+                                   found[:self.EXPANSIONS]] or [word])
+        return expansions
+
+    def stats(self):
+        ''' Index size counters '''
+        with self._lock:
+            stats = {'built_at': self.built_at}
+            for field, index in self._indexes.items():
+                stats[field + '_words'] = len(index)
+            stats['bytes'] = sum(
+                index.size() for index in self._indexes.values())
+            return stats
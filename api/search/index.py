@@ -0,0 +1,199 @@
+'''
+    In-process inverted index of businesses with BM25 ranking
+'''
+import math
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from threading import RLock
+from api.search import fold
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    ''' Accent and case folded words of a text '''
+    return TOKEN.findall(fold(text))
+
+
+class InvertedIndex():
+    '''
+        Postings of every (field, word) as sorted arrays of business ids
+        with a parallel array of term frequencies. Searches are answered
+        from memory, the database only loads the requested page
+    '''
+
+    # (field, BM25 weight)
+    FIELDS = (('name', 3.0), ('category', 2.0), ('city', 1.5),
+              ('country', 1.5), ('description', 1.0))
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self.built_at = None
+        self._lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        ''' Empty the index '''
+        # field number + word: (ids array, term frequencies array)
+        self._postings = {}
+        # id: (field lengths, posting keys)
+        self._documents = {}
+        self._total_lengths = [0] * len(self.FIELDS)
+
+    def build(self, rows):
+        '''
+            Index (id, name, category, city, country, description) rows,
+            replacing the current content
+        '''
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(row[0], row[1:])
+            self.ready = True
+            self.built_at = time.time()
+
+    def clear(self):
+        ''' Empty the index, it stops serving searches '''
+        with self._lock:
+            self._reset()
+            self.ready = False
+            self.built_at = None
+
+    def add(self, business_id, values):
+        '''
+            Index or re-index one business, values in FIELDS order
+        '''
+        with self._lock:
+            if self.ready:
+                self._remove(business_id)
+                self._add(business_id, values)
+
+    def remove(self, business_id):
+        ''' Drop one business '''
+        with self._lock:
+            if self.ready:
+                self._remove(business_id)
+
+    def _add(self, business_id, values):
+        ''' Insert the postings of a business '''
+        lengths = []
+        keys = []
+        for number, value in enumerate(values):
+            words = tokenize(value)
+            lengths.append(len(words))
+            self._total_lengths[number] += len(words)
+            frequencies = {}
+            for word in words:
+                frequencies[word] = frequencies.get(word, 0) + 1
+            for word, frequency in frequencies.items():
+                key = sys.intern(str(number) + word)
+                ids, tfs = self._postings.setdefault(
+                    key, (array('I'), array('H')))
+                position = bisect_left(ids, business_id)
+                ids.insert(position, business_id)
+                tfs.insert(position, min(frequency, 65535))
+                keys.append(key)
+        self._documents[business_id] = (array('H', lengths), tuple(keys))
+
+    def _remove(self, business_id):
+        ''' Delete the postings of a business '''
+        document = self._documents.pop(business_id, None)
+        if document is None:
+            return
+        lengths, keys = document
+        for number, length in enumerate(lengths):
+            self._total_lengths[number] -= length
+        for key in keys:
+            ids, tfs = self._postings[key]
+            position = bisect_left(ids, business_id)
+            del ids[position]
+            del tfs[position]
+            if not ids:
+                del self._postings[key]
+
+    def _matches(self, fields, text):
+        '''
+            Ids having every word of text in any of the fields, and their
+            matched posting keys
+        '''
+        words = tokenize(text)
+        if not words:
+            return set(), []
+        numbers = [number for number, (field, _) in enumerate(self.FIELDS)
+                   if field in fields]
+        matched = None
+        hits = []
+        for word in words:
+            found = set()
+            for number in numbers:
+                key = str(number) + word
+                if key in self._postings:
+                    found.update(self._postings[key][0])
+                    hits.append(key)
+            matched = found if matched is None else matched & found
+        return matched, hits
+
+    def _score(self, key, ids):
+        ''' BM25 contribution of one posting list to ids '''
+        number = int(key[0])
+        weight = self.FIELDS[number][1]
+        count = len(self._documents)
+        average = self._total_lengths[number] / count or 1
+        postings, tfs = self._postings[key]
+        idf = math.log(
+            1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+        scores = {}
+        for business_id in ids:
+            position = bisect_left(postings, business_id)
+            if position < len(postings) and \
+                    postings[position] == business_id:
+                frequency = tfs[position]
+                length = self._documents[business_id][0][number]
+                scores[business_id] = weight * idf * frequency * (
+                    self.k1 + 1) / (frequency + self.k1 * (
+                        1 - self.b + self.b * length / average))
+        return scores
+
+    def search(self, clauses):
+        '''
+            Ids matching every clause, best BM25 score first (newest
+            first on ties). A clause is a list of (fields, text)
+            alternatives and matches when one of them does
+        '''
+        with self._lock:
+            matched = None
+            hits = set()
+            for clause in clauses:
+                found = set()
+                for fields, text in clause:
+                    ids, keys = self._matches(fields, text)
+                    found |= ids
+                    hits.update(keys)
+                matched = found if matched is None else matched & found
+            if not matched:
+                return []
+            scores = dict.fromkeys(matched, 0.0)
+            for key in hits:
+                for business_id, score in self._score(key, matched).items():
+                    scores[business_id] += score
+            return sorted(matched, key=lambda business_id: (
+                -scores[business_id], -business_id))
+
+    def stats(self):
+        ''' Index size counters '''
+        with self._lock:
+            return {
+                'documents': len(self._documents),
+                'terms': len(self._postings),
+                'postings': sum(len(ids) for ids, _ in
+                                self._postings.values()),
+                'postings_bytes': sum(
+                    ids.itemsize * len(ids) + tfs.itemsize * len(tfs)
+                    for ids, tfs in self._postings.values()),
+                'built_at': self.built_at,
+            }
@@ -0,0 +1,211 @@
+'''
+    Typeahead suggestions of businesses names, categories, cities and
+    countries from sorted in-memory keys
+'''
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from api.search import fold, RebuiltIndex
+
+# Sorts after every character of a prefix completion
+LAST = '\U0010ffff'
+
+
+def rank(entry):
+    ''' Most popular first, then shortest and alphabetical '''
+    return -entry[1], len(entry[3]), entry[3], entry[2]
+
+
+class SuggestIndex(RebuiltIndex):
+    '''
+        Distinct values with their popularity (number of businesses
+        having them) and a sorted list of (key, field, folded value)
+        with a parallel list of the values entries. Every word start of
+        a value is a key, so a prefix is found by two bisections.
+        The best values of searched prefixes are kept and updated on
+        writes, short prefixes (which match the most keys) are ranked
+        when building
+    '''
+
+    FIELDS = ('name', 'category', 'city', 'country')
+    # Largest number of suggestions of a prefix
+    LIMIT = 20
+    # Best entries kept per prefix, the extra ones absorb writes
+    KEEP = 2 * LIMIT
+    # Prefixes of this length or less are ranked when building
+    SHORT_PREFIX = 3
+    # Largest number of longer prefixes with kept suggestions
+    CACHED_PREFIXES = 4096
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        ''' Empty the index '''
+        # (field, folded value): [value, popularity, field, folded value]
+        self._values = {}
+        self._keys = []
+        self._entries = []
+        # prefix: [all entries are kept, best entries in rank order], of
+        # short and other prefixes
+        self._short = {}
+        self._cached = {}
+
+    @staticmethod
+    def keys(folded):
+        ''' Word starts of a folded value '''
+        words = folded.split()
+        return [' '.join(words[start:]) for start in range(len(words))]
+
+    def prefixes(self, folded, longest=None):
+        ''' Prefixes of the keys of a folded value '''
+        return {key[:length] for key in self.keys(folded)
+                for length in range(1, min(len(key), longest or len(key)) + 1)}
+
+    def _load(self, rows):
+        '''
+            Values, sorted keys and ranked short prefixes of (name,
+            category, city, country) rows
+        '''
+        values = {}
+        for row in rows:
+            for field, value in zip(self.FIELDS, row):
+                folded = ' '.join(fold(value).split())
+                if folded:
+                    entry = values.setdefault(
+                        (field, folded), [value, 0, field, folded])
+                    entry[1] += 1
+        keys = sorted(((key, field, folded), entry)
+                      for (field, folded), entry in values.items()
+                      for key in self.keys(folded))
+        short = defaultdict(list)
+        for entry in values.values():
+            for prefix in self.prefixes(entry[3], self.SHORT_PREFIX):
+                short[prefix].append(entry)
+        return values, keys, {
+            prefix: [len(entries) <= self.KEEP,
+                     heapq.nsmallest(self.KEEP, entries, rank)]
+            for prefix, entries in short.items()}
+
+    def _install(self, content):
+        ''' Serve a loaded content '''
+        values, keys, short = content
+        self._reset()
+        self._values = values
+        self._keys = [key for key, _ in keys]
+        self._entries = [entry for _, entry in keys]
+        self._short = short
+
+    def clear(self):
+        ''' Empty the index until the next build '''
+        with self._lock:
+            self._reset()
+            self.ready = False
+            self.built_at = None
+
+    def _best(self, prefix):
+        ''' Kept best entries having a key starting with prefix '''
+        start = bisect_left(self._keys, (prefix,))
+        end = bisect_left(self._keys, (prefix + LAST,), start)
+        entries = {id(entry): entry for entry in self._entries[start:end]}
+        return [len(entries) <= self.KEEP,
+                heapq.nsmallest(self.KEEP, entries.values(), rank)]
+
+    def _tops(self, prefix):
+        ''' Kept best entries of prefixes as long as prefix '''
+        if len(prefix) <= self.SHORT_PREFIX:
+            return self._short
+        return self._cached
+
+    def _count(self, field, value, change):
+        ''' Add change to the popularity of a value '''
+        folded = ' '.join(fold(value).split())
+        entry = self._values.get((field, folded))
+        if not folded or entry is None and change <= 0:
+            return
+        if entry is None:
+            entry = self._values[(field, folded)] = [value, 0, field, folded]
+            for key in self.keys(folded):
+                position = bisect_left(self._keys, (key, field, folded))
+                self._keys.insert(position, (key, field, folded))
+                self._entries.insert(position, entry)
+        entry[1] += change
+        if entry[1] <= 0:
+            del self._values[(field, folded)]
+            for key in self.keys(folded):
+                position = bisect_left(self._keys, (key, field, folded))
+                del self._keys[position]
+                del self._entries[position]
+        for prefix in self.prefixes(folded):
+            tops = self._tops(prefix)
+            if prefix in tops:
+                self._rerank(tops, prefix, entry, change)
+
+    def _rerank(self, tops, prefix, entry, change):
+        '''
+            Update the kept best entries of a prefix after a popularity
+            change of entry. Values not kept rank after the last kept one
+            unless all are kept
+        '''
+        top = tops[prefix]
+        complete, best = top
+        if any(kept is entry for kept in best):
+            if entry[1] <= 0:
+                best.remove(entry)
+            else:
+                best.sort(key=rank)
+                if change < 0 and not complete and best[-1] is entry:
+                    # Values not kept may outrank it now
+                    best.pop()
+        elif change > 0 and (complete or rank(entry) < rank(best[-1])):
+            best.append(entry)
+            best.sort(key=rank)
+            if len(best) > self.KEEP:
+                best.pop()
+                top[0] = False
+        if not top[0] and len(best) < self.LIMIT:
+            tops[prefix] = self._best(prefix)
+
+    def _apply(self, change, values):
+        ''' Count or uncount one business '''
+        for field, value in zip(self.FIELDS, values):
+            self._count(field, value, change)
+
+    def add(self, values):
+        ''' Count one business, values in FIELDS order '''
+        self._write(1, values)
+
+    def remove(self, values):
+        ''' Uncount one business, values in FIELDS order '''
+        self._write(-1, values)
+
+    def suggest(self, text, limit=10):
+        '''
+            Most popular values having a word starting with text,
+            shortest first on ties, as (field, value, popularity)
+        '''
+        prefix = ' '.join(fold(text).split())
+        if not prefix:
+            return []
+        with self._lock:
+            tops = self._tops(prefix)
+            top = tops.get(prefix)
+            if top is None:
+                top = self._best(prefix)
+                if len(self._cached) >= self.CACHED_PREFIXES:
+                    self._cached.clear()
+                tops[prefix] = top
+            return [(entry[2], entry[0], entry[1])
+                    for entry in top[1][:limit]]
+
+    def stats(self):
+        ''' Index size counters '''
+        with self._lock:
+            return {
+                'values': len(self._values),
+                'keys': len(self._keys),
+                'short_prefixes': len(self._short),
+                'cached_prefixes': len(self._cached),
+                'built_at': self.built_at,
+            }
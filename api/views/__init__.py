@@ -1,11 +1,58 @@
 '''
     Our Main api routes
 '''
+import time
+import hashlib
 from functools import wraps
-from flask import jsonify, request
+from flask import jsonify, request, g, current_app
 from api.models.user import User
-from api.helpers import token_id
+from api.helpers import token_data, token_digest
 from api.models.token import Token
+from api.conf import token_cache, response_cache
+
+
+def verify_access_token(token):
+    '''
+        Resolve access token to (user_id, is_activated) or None.
+        Verified tokens are cached by digest until they expire, rows
+        loaded on a cache miss are kept on flask.g for the request
+    '''
+    digest = token_digest(token)
+    principal = token_cache.get(digest)
+    if principal is not None:
+        return principal
+    token_row = Token.get_by_token(token)
+    if token_row is None:
+        return None
+    data = token_data(token)
+    if data is False:
+        return None
+    user_id, expires_at = data
+    user = User.query.filter_by(id=user_id).first()
+    if user is None:
+        return None
+    g.user, g.token = user, token_row
+    principal = (user.id, user.activation_token is None)
+    token_cache.set(digest, principal, ttl=expires_at - time.time())
+    return principal
+
+
+def current_user():
+    '''
+        Authenticated user row, loaded at most once per request
+    '''
+    if g.get('user') is None:
+        g.user = User.query.get(g.user_id)
+    return g.user
+
+
+def current_token():
+    '''
+        Access token row of the request, loaded at most once per request
+    '''
+    if g.get('token') is None:
+        g.token = Token.get_by_token(request.headers.get('Authorization'))
+    return g.token
 
 
 def auth(arg):
@@ -14,17 +61,17 @@ def auth(arg):
     def wrap(*args, **kwargs):
         ''' Check if token exists in the request header'''
         if request.headers.get('Authorization'):
-            token = request.headers.get('Authorization')
-            token_exist = Token.query.filter_by(access_token=token).first()
-            if token_exist is not None and token_id(token):
-                user = User.query.filter_by(id=token_id(token)).first()
-                if user.activation_token is not None:
+            principal = verify_access_token(
+                request.headers.get('Authorization'))
+            if principal is not None:
+                if principal[1] is False:
                     response = jsonify({
                         'status': 'error',
                         'message': "Please confirm your email address"
                     })
                     response.status_code = 401
                     return response
+                g.user_id = principal[0]
                 return arg(*args, **kwargs)
         response = jsonify({
             'status': 'error',
@@ -33,3 +80,75 @@ def auth(arg):
         response.status_code = 401
         return response
     return wrap
+
+
+def cached_response(view):
+    '''
+        Serve successful public GET responses from the response cache.
+        Entries are keyed by endpoint, url arguments and sorted query
+        arguments, views tag them with g.cache_tag so model writes can
+        invalidate them
+    '''
+    @wraps(view)
+    def wrap(*args, **kwargs):
+        ''' Look up the cache before calling the view '''
+        key = (request.endpoint, tuple(sorted(kwargs.items())),
+               tuple(sorted(request.args.items(multi=True))))
+        entry = response_cache.get(key)
+        if entry is not None:
+            response = current_app.response_class(
+                entry[1], status=entry[2], headers=entry[3])
+            response.headers['X-Cache'] = 'HIT'
+            return response.make_conditional(request)
+        response = view(*args, **kwargs)
+        if response.status_code == 200 and g.get('cache_tag') is not None:
+            response_cache.store(key, g.cache_tag, response)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrap
+
+
+def conditional(version):
+    '''
+        Weak ETag validation of GET views. version(**view_args) returns
+        (parts, last_modified) describing the current data, or None to
+        let the view answer. The ETag is a digest of the request and
+        those parts, so a matching If-None-Match (or If-Modified-Since
+        when last_modified is known) is answered with 304 before the
+        view queries and serializes anything
+    '''
+    def decorator(view):
+        ''' Wrap the view '''
+        @wraps(view)
+        def wrap(*args, **kwargs):
+            ''' Compare validators before calling the view '''
+            current = version(**kwargs)
+            if current is None:
+                return view(*args, **kwargs)
+            parts, last_modified = current
+            etag = hashlib.md5(repr((
+                request.endpoint, sorted(kwargs.items()),
+                sorted(request.args.items(multi=True)), tuple(parts)
+            )).encode('utf-8')).hexdigest()
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (
+                    last_modified is not None and
+                    request.if_modified_since is not None and
+                    last_modified.replace(microsecond=0) <=
+                    request.if_modified_since.replace(tzinfo=None))
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let browsers keep the body but revalidate every poll
+            response.cache_control.no_cache = True
+            return response
+        return wrap
+    return decorator
@@ -1,25 +1,52 @@
 '''
     Business features routes
 '''
-from flask import Blueprint, jsonify, request
-from sqlalchemy import func, desc, or_
+from flask import Blueprint, jsonify, request, g
+from sqlalchemy import desc, or_
 from flasgger.utils import swag_from
-from api.models.business import Business
+from api.models.business import Business, BUSINESS_FIELDS
 from api.models.review import Review
+from api.models.listing_version import ListingVersion
 from api.docs.docs import (REGISTER_BUSINESS_DOCS,
                            GET_ALL_BUSINESSES_DOCS,
                            UPDATE_BUSINESS_DOCS,
                            DELETE_BUSINESS_DOCS,
+                           SUGGEST_BUSINESSES_DOCS,
                            GET_BUSINESS_DOCS)
 from api.inputs.inputs import (
     validate,
     REGISTER_BUSINESS_RULES)
-from api.helpers import token_id
-from api.views import auth
+from api.helpers import parse_fields
+from api.pagination import (page_size, decode_cursor, keyset_paginate,
+                            window_paginate, estimate_paginate,
+                            ids_paginate)
+from api.conf import count_cache, suggest_index
+from api.search import fold
+from api.search.backends import search_backend
+from api.views import auth, cached_response, conditional
 
 BUSINESS = Blueprint('businesses', __name__)
 
 
+def business_version(business_id):
+    '''
+        ETag parts and last modification of a business pages
+    '''
+    row = Business.version(business_id)
+    if row is None:
+        return None
+    return tuple(row), row.updated_at
+
+
+def listing_version(user_id=None):
+    '''
+        ETag parts of businesses listings: the stored listings version
+        bumped by every business and review write. Deletions are not
+        dated so listings have no Last-Modified
+    '''
+    return (ListingVersion.current(), user_id), None
+
+
 @BUSINESS.route('', methods=['POST'])
 @auth
 @swag_from(REGISTER_BUSINESS_DOCS)
@@ -36,11 +63,11 @@ def register_business():
             errors=valid)
         response.status_code = 400
         return response
-    user_id = token_id(request.headers.get('Authorization'))
+    user_id = g.user_id
     if Business.query.order_by(
             desc(Business.created_at)).filter(
-                Business.user_id == user_id, func.lower(
-                    Business.name) == func.lower(sent_data['name'])
+                Business.user_id == user_id,
+                Business.name_key == fold(sent_data['name'])
     ).first() is not None:
         response = jsonify(
             status='error',
@@ -72,7 +99,7 @@ def delete_business(business_id):
     '''
         Delete business
     '''
-    user_id = token_id(request.headers.get('Authorization'))
+    user_id = g.user_id
     business = Business.get_by_user(business_id, user_id)
     if business is not None:
         Review.delete_all(business.id)
@@ -99,7 +126,7 @@ def update_business(business_id):
         Update business
     '''
     sent_data = request.get_json(force=True)
-    user_id = token_id(request.headers.get('Authorization'))
+    user_id = g.user_id
     business = Business.get_by_user(business_id, user_id)
     if business is not None:
         valid = validate(sent_data, REGISTER_BUSINESS_RULES)
@@ -119,14 +146,14 @@ def update_business(business_id):
         }
         if Business.has_two_same_business(
                 user_id, sent_data['name'],
-                business_id):
+                business.id):
             response = jsonify(
                 status='error',
                 message=("You have already registered"
                          " a business with same name"))
             response.status_code = 400
             return response
-        Business.update(business_id, data)
+        Business.update(business.id, data)
         response = jsonify({
             'status': 'ok',
             'message': "Your business has been successfully updated"
@@ -143,6 +170,7 @@ def update_business(business_id):
 
 @BUSINESS.route('', methods=['GET'])
 @swag_from(GET_ALL_BUSINESSES_DOCS)
+@conditional(listing_version)
 def get_all_businesses():
     '''
         Get all Businesses
@@ -154,48 +182,46 @@ def get_all_businesses():
     searchAll = request.args.get('searchAll')
     page = request.args.get('page')
     per_page = request.args.get('limit')
-    businesses = Business.query.order_by(
-        desc(Business.created_at)).order_by(desc(Business.created_at))
-
-    # Filter by search query
-    name_q = category_q = country_q = city_q = None
-
-    if name or category or country or city:
-        # Filter by
-        if name is not None and name.strip() != '':
-            name_q = func.lower(
-                Business.name).like('%' + func.lower(name) + '%')
-
-        # Filter by category
-        if category is not None and category.strip() != '':
-            category_q = func.lower(
-                Business.category).like('%' + func.lower(category) + '%')
-
-        # Filter by city
-        if city is not None and city.strip() != '':
-            city_q = func.lower(Business.city).like(
-                '%' + func.lower(city) + '%')
+    cursor = request.args.get('cursor')
+    count = request.args.get('count')
+    match = request.args.get('match')
+    fields = parse_fields(request.args.get('fields'), BUSINESS_FIELDS)
+    businesses = Business.listing(fields or None).order_by(
+        desc(Business.created_at))
 
-        # Filter by country
-        if country is not None and country.strip() != '':
-            country_q = func.lower(Business.country).like(
-                '%' + func.lower(country) + '%')
-        businesses = businesses.filter(
-            or_(
-                name_q,
-                country_q,
-                city_q,
-                category_q
-            ))
-    if searchAll is not None or searchAll == 'true':
+    # Search clauses, each must match one of its (columns, term)
+    search = search_backend(match)
+    searched = [(column, term) for column, term in (
+        (Business.name, name), (Business.category, category),
+        (Business.city, city), (Business.country, country))
+        if term is not None and term.strip() != '']
+    clauses = []
+    if searched:
+        # Filter by name, category, city or country
+        clauses.append([((column,), term) for column, term in searched])
+    if searchAll is not None and name is not None and name.strip() != '':
         # Search by all
-        if name is not None and name.strip() != '':
-            businesses = businesses.filter(or_(func.lower(
-                Business.name).like('%' + func.lower(name) + '%'), func.lower(
-                Business.city).like('%' + func.lower(name) + '%'), func.lower(
-                Business.category).like('%' + func.lower(name) + '%'),
-                func.lower(Business.country).like(
-                    '%' + func.lower(name) + '%')))
+        clauses.append([((Business.name, Business.city, Business.category,
+                          Business.country), name)])
+
+    ranked_ids = None
+    if getattr(search, 'index', None) is not None and search.index.ready \
+            and clauses and cursor is None:
+        # Ranked by the in-process index, only the page is loaded
+        ranked_ids = search.index.search([
+            [([column.key for column in columns], term)
+             for columns, term in clause] for clause in clauses])
+    else:
+        for clause in clauses:
+            businesses = businesses.filter(or_(*[
+                search.match(column, term)
+                for columns, term in clause for column in columns]))
+        # Best matches first
+        rank = search.rank([term for _, term in searched]) \
+            if searched else None
+        if rank is not None:
+            businesses = businesses.order_by(None).order_by(
+                desc(rank), desc(Business.created_at))
 
     errors = []  # Errors list
 
@@ -206,6 +232,23 @@ def get_all_businesses():
     if page is not None and page.isdigit() is False and page.strip() != '':
         errors.append({'page': 'Invalid page number'})
 
+    if fields is False:
+        errors.append({'fields': 'Invalid fields, choose from: ' +
+                       ', '.join(BUSINESS_FIELDS)})
+
+    position = None
+    if cursor is not None and cursor.strip() != '':
+        position = decode_cursor(cursor.strip())
+        if position is None:
+            errors.append({'cursor': 'Invalid cursor'})
+
+    if count is not None and count not in ('exact', 'estimate'):
+        errors.append({'count': 'Invalid count, choose from: exact, estimate'})
+
+    if match is not None and match not in ('substring', 'similar', 'fuzzy'):
+        errors.append({'match': ('Invalid match, choose from: '
+                                 'substring, similar, fuzzy')})
+
     if len(errors) is not 0:
         response = jsonify(
             status='error',
@@ -215,13 +258,49 @@ def get_all_businesses():
         return response
 
     page = int(page) if page is not None and page.strip() != '' else 1
-    per_page = int(
-        per_page) if per_page is not None and per_page.strip() != '' else 20
+    per_page = page_size(int(
+        per_page) if per_page is not None and per_page.strip() != '' else 20)
 
-    # Overall filter results
-    businesses = businesses.paginate(per_page=per_page, page=page)
+    if cursor is not None:
+        # Keyset pages, `cursor=` starts from the newest business
+        items, next_cursor = keyset_paginate(
+            businesses, Business.created_at, Business.id, position, per_page)
+        if items:
+            response = jsonify({
+                'status': 'ok',
+                'message': 'There are {} businesses found'.format(
+                    str(len(items))
+                ),
+                'next_cursor': next_cursor,
+                'businesses': Business.serialize_rows(items)
+            })
+            response.status_code = 200
+            return response
+        response = jsonify(
+            status='error', message="No business found!")
+        response.status_code = 200
+        return response
 
-    if len(Business.serializer(businesses.items)) is not 0:
+    # Totals only depend on the search filters, keyed by the folded
+    # terms they match
+    count_key = tuple(
+        (tuple(column.key for column in columns), fold(term))
+        for clause in clauses for columns, term in clause) + (
+            match or 'substring',)
+    if ranked_ids is not None:
+        businesses = ids_paginate(
+            businesses, Business.id, ranked_ids, page, per_page)
+    elif count == 'estimate':
+        # Cached exact total or planner estimate, rows are not counted
+        businesses = estimate_paginate(
+            businesses, page, per_page, count_cache.get(count_key))
+    else:
+        # Overall filter results, counted by the page query
+        businesses = window_paginate(businesses, page, per_page)
+    if businesses.total_exact:
+        count_cache.set(count_key, businesses.total)
+
+    if businesses.items:
         response = jsonify({
             'status': 'ok',
             'message': 'There are {} businesses found'.format(
@@ -232,7 +311,8 @@ def get_all_businesses():
             'current_page': businesses.page,
             'pages': businesses.pages,
             'total_businesses': businesses.total,
-            'businesses': Business.serializer(businesses.items)
+            'total_exact': businesses.total_exact,
+            'businesses': Business.serialize_rows(businesses.items)
         })
         response.status_code = 200
         return response
@@ -242,18 +322,70 @@ def get_all_businesses():
     return response
 
 
+@BUSINESS.route('/suggest', methods=['GET'])
+@swag_from(SUGGEST_BUSINESSES_DOCS)
+def suggest_businesses():
+    '''
+        Typeahead suggestions, served from memory
+    '''
+    text = request.args.get('q')
+    limit = request.args.get('limit')
+    errors = []
+    if text is None or text.strip() == '':
+        errors.append({'q': 'Please provide a search text'})
+    if limit is not None and limit.isdigit() is False and limit.strip() != '':
+        errors.append({'limit': 'Invalid suggestions limit number'})
+    if errors:
+        response = jsonify(
+            status='error',
+            message="Please provide valid details",
+            errors=errors)
+        response.status_code = 400
+        return response
+    limit = max(1, min(int(limit) if limit is not None and limit.strip() != ''
+                       else 10, suggest_index.LIMIT))
+    if not suggest_index.ready:
+        response = jsonify(
+            status='error',
+            message='Suggestions are not available yet, try again later')
+        response.status_code = 503
+        response.headers['Retry-After'] = '10'
+        return response
+    response = jsonify({
+        'status': 'ok',
+        'suggestions': [
+            {'field': field, 'value': value, 'businesses': popularity}
+            for field, value, popularity in suggest_index.suggest(
+                text, limit)],
+    })
+    response.status_code = 200
+    return response
+
+
 @BUSINESS.route('/<business_id>', methods=['GET'])
 @swag_from(GET_BUSINESS_DOCS)
+@cached_response
+@conditional(business_version)
 def get_business(business_id):
     '''
         Get business
     '''
-    business = Business.get(business_id)
+    fields = parse_fields(request.args.get('fields'), BUSINESS_FIELDS)
+    if fields is False:
+        response = jsonify(
+            status='error',
+            message="Please provide valid details",
+            errors=[{'fields': 'Invalid fields, choose from: ' +
+                     ', '.join(BUSINESS_FIELDS)}])
+        response.status_code = 400
+        return response
+    business = Business.find_row(business_id, fields)
     if business is not None:
+        g.cache_tag = Business.primary_key(business_id)
         response = jsonify({
             'status': 'ok',
             'message': 'Business found',
-            'business': Business.serialize_obj(business),
+            'business': Business.serialize_rows([business])[0],
         })
         response.status_code = 200
         return response
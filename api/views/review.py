@@ -1,17 +1,17 @@
 '''
     Reviews features Routes
 '''
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, g
 from flasgger.utils import swag_from
-from sqlalchemy import desc
 from api.models.business import Business
-from api.models.review import Review
+from api.models.review import Review, REVIEW_FIELDS
 from api.docs.docs import (ADD_BUSINESS_REVIEW_DOCS,
                            BUSINESS_REVIEWS_DOCS)
 from api.inputs.inputs import (
     validate, REVIEW_RULES)
-from api.helpers import token_id
-from api.views import auth
+from api.helpers import parse_fields
+from api.views import auth, cached_response, conditional
+from api.views.business import business_version
 
 REVIEW = Blueprint('reviews', __name__)
 
@@ -23,7 +23,7 @@ def add_business_review(business_id):
     '''
         Add Review
     '''
-    user_id = token_id(request.headers.get('Authorization'))
+    user_id = g.user_id
     business = Business.get(business_id)
     if business is not None:
         sent_data = request.get_json(force=True)
@@ -56,20 +56,31 @@ def add_business_review(business_id):
 
 @REVIEW.route('businesses/<business_id>/reviews', methods=['GET'])
 @swag_from(BUSINESS_REVIEWS_DOCS)
+@cached_response
+@conditional(business_version)
 def get_business_reviews(business_id):
     '''
         Business reviews
     '''
+    fields = parse_fields(request.args.get('fields'), REVIEW_FIELDS)
+    if fields is False:
+        response = jsonify(
+            status='error',
+            message="Please provide valid details",
+            errors=[{'fields': 'Invalid fields, choose from: ' +
+                     ', '.join(REVIEW_FIELDS)}])
+        response.status_code = 400
+        return response
     business = Business.get(business_id)
     if business is not None:
-        reviews = Review.query.order_by(desc(Review.created_at)).filter_by(
-            business_id=Business.get(business_id).id).all()
+        g.cache_tag = business.id
+        reviews = Review.get_business_reviews(business.id, fields)
         if len(reviews) is not 0:
             response = jsonify({
                 'status': 'ok',
                 'message': str(len(reviews)) + " reviews found",
                 'business': Business.serialize_obj(business),
-                'reviews': Review.serializer(reviews)
+                'reviews': Review.serialize_rows(reviews)
             })
             response.status_code = 200
             return response
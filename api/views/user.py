@@ -1,14 +1,14 @@
 '''
     User routes
 '''
-from flask import Blueprint, jsonify, request, render_template
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, jsonify, request, render_template, g
 from flasgger.utils import swag_from
-from sqlalchemy import func, desc
+from sqlalchemy import desc
 from api.models.user import User
-from api.models.business import Business
+from api.models.business import Business, BUSINESS_FIELDS
 from api.models.token import Token
 from api.models.password_reset import PasswordReset
+from api.models import db
 from api.docs.docs import (REGISTER_DOCS,
                            LOGIN_DOCS,
                            LOGOUT_DOCS,
@@ -22,13 +22,33 @@ from api.inputs.inputs import (
     validate, REGISTER_RULES, LOGIN_RULES, RESET_PWD_RULES,
     CHANGE_PWD_RULES, RESET_LINK_RULES, CONFIRM_EMAIL_RULES,
     CONFIRM_TOKEN_RULES)
-from api.helpers import (get_token, token_id, generate_reset_token,
-                         get_confirm_email_token, send_mail)
-from api.views import auth
+from api.helpers import (get_token, generate_reset_token,
+                         get_confirm_email_token, send_mail, parse_fields)
+from api.pagination import (page_size, decode_cursor, keyset_paginate,
+                            window_paginate)
+from api.views import auth, current_user, current_token, conditional
+from api.views.business import listing_version
+from api.conf import hasher, login_email_limiter, login_ip_limiter
+from api.search import fold
+from api.passwords import PasswordHasherBusy
 
 USER = Blueprint('users', __name__)
 
 
+@USER.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    '''
+        Shed load when too many passwords are waiting to be hashed
+    '''
+    response = jsonify({
+        'status': 'error',
+        'message': "Too many requests, please try again later"
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
 @USER.route('auth/register', methods=['POST'])
 @swag_from(REGISTER_DOCS)
 def register():
@@ -87,7 +107,7 @@ def register():
             'username': sent_data['username'],
             'email': sent_data['email'],
             'activation_token': gen_token,
-            'password': generate_password_hash(sent_data['password'])
+            'password': hasher.hash(sent_data['password'])
         })
         message = '''You have been successfully registered,
                     Please confirm email address'''
@@ -109,9 +129,7 @@ def logout():
     '''
         User logout
     '''
-    token = Token.query.filter_by(
-        access_token=request.headers.get('Authorization')).first()
-    Token.delete(token.id)
+    Token.delete(current_token().id)
     response = jsonify({
         'status': 'ok',
         'message': "You have successfully logged out"
@@ -139,11 +157,26 @@ def login():
         'email': sent_data['email'],
         'password': sent_data['password'],
     }
+    # Shed brute force attempts before any database or hashing work
+    email_key = 'email:' + data['email'].lower()
+    # Peer address, the client one when PROXY_FIX_X_FOR trusts proxies
+    ip_key = 'ip:' + str(request.remote_addr)
+    retry_after = max(login_email_limiter.retry_after([email_key]),
+                      login_ip_limiter.retry_after([ip_key]))
+    if retry_after:
+        response = jsonify({
+            'status': 'error',
+            'message': "Too many login attempts, please try again later"
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
     # Check if email exists
     logged_user = User.get_user(data['email'])
     if logged_user is not None:
         # Check password
-        if check_password_hash(logged_user.password, data['password']):
+        if hasher.verify(logged_user.password, data['password']):
+            login_email_limiter.reset(email_key)
             if logged_user.activation_token is not None:
                 response = jsonify({
                     'status': 'error',
@@ -151,6 +184,9 @@ def login():
                 })
                 response.status_code = 401
                 return response
+            if hasher.needs_rehash(logged_user.password):
+                User.update_password(
+                    logged_user.id, hasher.hash(data['password']))
             token_ = get_token(logged_user.id)
             Token.save({
                 'user_id': logged_user.id,
@@ -168,6 +204,8 @@ def login():
             response.status_code = 200
             # response.headers['auth_token'] = token
             return response
+    login_email_limiter.hit([email_key])
+    login_ip_limiter.hit([ip_key])
     response = jsonify({
         'status': 'error',
         'message': "Invalid email or password"
@@ -191,9 +229,8 @@ def change_password():
                            errors=valid)
         response.status_code = 400
         return response
-    user_id = token_id(request.headers.get('Authorization'))
-    user = User.query.filter_by(id=user_id).first()
-    if check_password_hash(user.password, sent_data['old_password']) is False:
+    user = current_user()
+    if hasher.verify(user.password, sent_data['old_password']) is False:
         response = jsonify({
             'status': 'error',
             'message': "Invalid old password"
@@ -201,7 +238,7 @@ def change_password():
         response.status_code = 400
         return response
     User.update_password(
-        user.id, generate_password_hash(sent_data['new_password']))
+        user.id, hasher.hash(sent_data['new_password']))
     response = jsonify({
         'status': 'ok',
         'message': "You have successfully changed your password"
@@ -224,7 +261,7 @@ def reset_password(token):
                            errors=valid)
         response.status_code = 400
         return response
-    token = PasswordReset.query.filter_by(reset_token=token).first()
+    token = PasswordReset.get_by_token(token)
     if token is None:
         response = jsonify({
             'status': 'error',
@@ -232,9 +269,8 @@ def reset_password(token):
         })
         response.status_code = 400
         return response
-    user = User.query.filter_by(id=token.user_id).first()
     User.update_password(
-        user.id, generate_password_hash(sent_data['password']))
+        token.user_id, hasher.hash(sent_data['password']))
     PasswordReset.delete(token.id)
     response = jsonify({
         'status': 'ok',
@@ -258,8 +294,7 @@ def confirm_email(token):
                            errors=valid)
         response.status_code = 400
         return response
-    token = User.query.filter_by(
-        activation_token=token, email=sent_data['email']).first()
+    token = User.get_by_activation_token(token, sent_data['email'])
     if token is None:
         response = jsonify({
             'status': 'error',
@@ -267,8 +302,7 @@ def confirm_email(token):
         })
         response.status_code = 400
         return response
-    user = User.query.filter_by(id=token.id, email=sent_data['email']).first()
-    User.activate(user.id)
+    User.activate(token.id)
     response = jsonify({
         'status': 'ok',
         'message': "Your email was confirmed"
@@ -291,8 +325,7 @@ def confirm_token_existance():
                            errors=valid)
         response.status_code = 400
         return response
-    token = User.query.filter_by(
-        activation_token=sent_data['token']).first()
+    token = User.get_by_activation_token(sent_data['token'])
     if token is None:
         response = jsonify({
             'status': 'error',
@@ -350,66 +383,93 @@ def reset_link():
 @USER.route('account/businesses', methods=['GET'])
 @auth
 @swag_from(GET_BUSINESSES_DOCS)
+@conditional(lambda: listing_version(g.user_id))
 def get_user_businesses():
     '''
         User's Businesses list
     '''
-    user_id = token_id(request.headers.get('Authorization'))
+    user_id = g.user_id
     query = request.args.get('name')
     category = request.args.get('category')
     city = request.args.get('city')
     country = request.args.get('country')
     page = request.args.get('page')
     per_page = request.args.get('limit')
-    businesses = Business.query.order_by(
-        desc(Business.created_at)).filter_by(user_id=user_id)
-    if businesses.count() is not 0:
-
-        # Filter by search query
-        if query is not None and query.strip() != '':
-            businesses = businesses.filter(func.lower(
-                Business.name).like('%' + func.lower(query) + '%'))
-
-        # Filter by category
-        if category is not None and category.strip() != '':
-            businesses = businesses.filter(func.lower(
-                Business.category) == func.lower(category))
-
-        # Filter by city
-        if city is not None and city.strip() != '':
-            businesses = businesses.filter(
-                func.lower(Business.city) == func.lower(city))
-
-        # Filter by country
-        if country is not None and country.strip() != '':
-            businesses = businesses.filter(func.lower(
-                Business.country) == func.lower(country))
-
-        errors = []  # Errors list
-
-        if (per_page is not None and per_page.isdigit() is False and
-                per_page.strip() != ''):
-            errors.append({'limit': 'Invalid limit page limit number'})
-
-        if page is not None and page.isdigit() is False and page.strip() != '':
-            errors.append({'page': 'Invalid page number'})
-
-        if len(errors) is not 0:
-            response = jsonify(
-                status='error', message="Please provide valid details",
-                errors=errors)
-            response.status_code = 400
-            return response
-
-        page = int(page) if page is not None and page.strip() != '' else 1
-        per_page = int(
-            per_page) if ((per_page is not None)
-                          and (per_page.strip() != '')) else 20
+    cursor = request.args.get('cursor')
+    fields = parse_fields(request.args.get('fields'), BUSINESS_FIELDS)
+    businesses = Business.listing(fields or None).order_by(
+        desc(Business.created_at)).filter(Business.user_id == user_id)
+    # Filter by search query
+    if query is not None and query.strip() != '':
+        businesses = businesses.filter(
+            Business.name_key.like('%' + fold(query) + '%'))
+
+    # Filter by category
+    if category is not None and category.strip() != '':
+        businesses = businesses.filter(
+            Business.category_key == fold(category))
+
+    # Filter by city
+    if city is not None and city.strip() != '':
+        businesses = businesses.filter(Business.city_key == fold(city))
+
+    # Filter by country
+    if country is not None and country.strip() != '':
+        businesses = businesses.filter(
+            Business.country_key == fold(country))
+
+    errors = []  # Errors list
+
+    if (per_page is not None and per_page.isdigit() is False and
+            per_page.strip() != ''):
+        errors.append({'limit': 'Invalid limit page limit number'})
+
+    if page is not None and page.isdigit() is False and page.strip() != '':
+        errors.append({'page': 'Invalid page number'})
+
+    if fields is False:
+        errors.append({'fields': 'Invalid fields, choose from: ' +
+                       ', '.join(BUSINESS_FIELDS)})
+
+    position = None
+    if cursor is not None and cursor.strip() != '':
+        position = decode_cursor(cursor.strip())
+        if position is None:
+            errors.append({'cursor': 'Invalid cursor'})
+
+    if len(errors) is not 0:
+        response = jsonify(
+            status='error', message="Please provide valid details",
+            errors=errors)
+        response.status_code = 400
+        return response
 
-        # Overall filter results
-        businesses = businesses.paginate(per_page=per_page, page=page)
+    page = int(page) if page is not None and page.strip() != '' else 1
+    per_page = page_size(int(
+        per_page) if ((per_page is not None)
+                      and (per_page.strip() != '')) else 20)
+
+    if cursor is not None:
+        # Keyset pages, `cursor=` starts from the newest business
+        items, next_cursor = keyset_paginate(
+            businesses, Business.created_at, Business.id, position,
+            per_page)
+        if items:
+            response = jsonify({
+                'status': 'ok',
+                'message': 'There are {} businesses found'.format(
+                    str(len(items))
+                ),
+                'next_cursor': next_cursor,
+                'businesses': Business.serialize_rows(items)
+            })
+            response.status_code = 200
+            return response
+    else:
+        # Overall filter results, counted by the page query
+        businesses = window_paginate(businesses, page, per_page)
 
-        if len(Business.serializer(businesses.items)) is not 0:
+        if businesses.items:
             response = jsonify({
                 'status': 'ok',
                 'message': 'There are {} businesses found'.format(
@@ -420,15 +480,17 @@ def get_user_businesses():
                 'current_page': businesses.page,
                 'pages': businesses.pages,
                 'total_businesses': businesses.total,
-                'businesses': Business.serializer(businesses.items)
+                'businesses': Business.serialize_rows(businesses.items)
             })
             response.status_code = 200
             return response
+
+    if db.session.query(Business.id).filter(
+            Business.user_id == user_id).first() is not None:
         response = jsonify(
             status='error', message="No business found!")
         response.status_code = 200
         return response
-
     response = jsonify(
         status='error', message="You don't have any registered business")
     response.status_code = 200
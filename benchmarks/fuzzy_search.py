@@ -0,0 +1,78 @@
+'''
+    Benchmark the fuzzy search index: size and build time, latency
+    (p50/p99) of the misspelled words corrections and of match=fuzzy
+    listing pages
+
+    Seed synthetic businesses (see benchmarks.search_latency) and run:
+        python -m benchmarks.fuzzy_search --seed 100000 --runs 200
+'''
+import argparse
+import os
+import time
+from sqlalchemy import desc, or_
+from api import create_app
+from api.models import db
+from api.models.business import Business
+from api.conf import fuzzy_index
+from api.search.backends import FuzzySearch, build_fuzzy_index
+from benchmarks.search_latency import seed, percentile
+
+# (field, misspelled words)
+TERMS = [('name', 'cofee'), ('name', 'phramacy'), ('name', 'rooftp gril'),
+         ('category', 'bakerry'), ('city', 'nairobbi'), ('city', 'kigai'),
+         ('name', 'unknownword')]
+
+
+def timed(run, runs):
+    ''' Latencies in ms of runs calls and the last result '''
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, result
+
+
+def search_page(field, term, limit):
+    ''' First page of a match=fuzzy field search, as the view builds it '''
+    column = getattr(Business, field)
+    return Business.listing().filter(or_(FuzzySearch.match(
+        column, term))).order_by(desc(Business.created_at)).limit(limit).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Synthetic businesses to insert first')
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    app = create_app(os.getenv('ENV', 'development'))
+    with app.app_context():
+        if args.seed:
+            seed(args.seed)
+        started = time.perf_counter()
+        build_fuzzy_index()
+        stats = fuzzy_index.stats()
+        print('{} businesses: {name_words} name, {category_words} category, '
+              '{city_words} city words, {bytes} bytes, built in {ms:.0f} '
+              'ms'.format(db.session.query(Business.id).count(),
+                          ms=(time.perf_counter() - started) * 1000,
+                          **stats))
+        for field, term in TERMS:
+            timings, expansions = timed(
+                lambda: fuzzy_index.expand(field, term), args.runs)
+            print('{:<8} {:<14} expand  p50 {:>7.3f} ms  p99 {:>7.3f} ms  '
+                  '{}'.format(field, repr(term), percentile(timings, 50),
+                              percentile(timings, 99), expansions))
+            timings, found = timed(
+                lambda: search_page(field, term, args.limit),
+                max(1, args.runs // 10))
+            print('{:<8} {:<14} page    p50 {:>7.2f} ms  p99 {:>7.2f} ms  '
+                  '{} found'.format('', '', percentile(timings, 50),
+                                    percentile(timings, 99), len(found)))
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
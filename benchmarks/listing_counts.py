@@ -0,0 +1,70 @@
+'''
+    Benchmark listing totals: exact COUNT(*), count(*) over () window and
+    planner estimates (PostgreSQL only), with the estimates error
+
+    Seed businesses first (see fake.py), then run:
+        python -m benchmarks.listing_counts --repeat 5
+'''
+import argparse
+import os
+import time
+from sqlalchemy import desc
+from api import create_app
+from api.models import db
+from api.models.business import Business
+from api.pagination import estimate_count, window_paginate
+
+# (label, search filter)
+SEARCHES = [
+    ('unfiltered', None),
+    ('name like "a"', Business.name_key.like('%a%')),
+    ('name like "inc"', Business.name_key.like('%inc%')),
+    ('city like "port"', Business.city_key.like('%port%')),
+]
+
+
+def best_ms(run, repeat):
+    ''' Best latency over repeated runs and the last result '''
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    app = create_app(os.getenv('ENV', 'development'))
+    with app.app_context():
+        for label, search in SEARCHES:
+            query = Business.listing().order_by(desc(Business.created_at))
+            if search is not None:
+                query = query.filter(search)
+            count_ms, total = best_ms(
+                lambda: query.order_by(None).count(), args.repeat)
+            window_ms, _ = best_ms(
+                lambda: window_paginate(query, 1, args.limit), args.repeat)
+            page_ms, _ = best_ms(
+                lambda: query.limit(args.limit).all(), args.repeat)
+            print('{:<18} {:>9} rows  COUNT {:>8.2f} ms  window page '
+                  '{:>8.2f} ms  plain page {:>8.2f} ms'.format(
+                      label, total, count_ms, window_ms, page_ms))
+            estimate_ms, estimate = best_ms(
+                lambda: estimate_count(query), args.repeat)
+            if estimate is None:
+                print('{:<18} estimates need PostgreSQL'.format(''))
+            else:
+                error = abs(estimate - total) / total * 100 if total else 0
+                print('{:<18} {:>9} estimated  EXPLAIN {:>6.2f} ms  '
+                      'error {:>6.1f}%'.format(
+                          '', estimate, estimate_ms, error))
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''
+    Benchmark listing serialization: ORM instances vs column tuples
+
+    Seed businesses first (see fake.py), then run:
+        python -m benchmarks.listing_serializers --rows 1000
+'''
+import argparse
+import os
+import time
+from sqlalchemy import desc
+from api import create_app
+from api.models import db
+from api.models.business import Business, BUSINESS_FIELDS
+from api.helpers import hashid
+
+
+def serialize_instances(businesses):
+    '''
+        Listing dicts of ORM instances, as listings were serialized
+        before column tuples
+    '''
+    return [{
+        'id': business.public_id,
+        'user_id': hashid(business.user_id),
+        'name': business.name,
+        'description': business.description,
+        'category': business.category,
+        'country': business.country,
+        'city': business.city,
+        'reviews_count': business.reviews_count,
+        'created_at': business.created_at,
+    } for business in businesses]
+
+
+def rows_per_second(serialize, repeat):
+    ''' Best rows per second over repeated runs '''
+    best = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = len(serialize())
+        db.session.remove()
+        best = max(best, count / (time.perf_counter() - started))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    app = create_app(os.getenv('ENV', 'development'))
+    with app.app_context():
+        print('ORM instances:           {:>10.0f} rows/s'.format(
+            rows_per_second(lambda: serialize_instances(
+                Business.query.order_by(desc(Business.created_at))
+                .limit(args.rows).all()), args.repeat)))
+        print('Column tuples:           {:>10.0f} rows/s'.format(
+            rows_per_second(lambda: Business.serialize_rows(
+                Business.listing().order_by(desc(Business.created_at))
+                .limit(args.rows).all()), args.repeat)))
+        print('Column tuples, no descr: {:>10.0f} rows/s'.format(
+            rows_per_second(lambda: Business.serialize_rows(
+                Business.listing([field for field in BUSINESS_FIELDS
+                                  if field != 'description'])
+                .order_by(desc(Business.created_at))
+                .limit(args.rows).all()), args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
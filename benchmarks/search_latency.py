@@ -0,0 +1,109 @@
+'''
+    Benchmark businesses search latency (p50/p99) of the listing search
+    filters with the configured SEARCH_BACKEND and the similarity mode
+
+    Seed one million synthetic businesses and run against PostgreSQL:
+        python -m benchmarks.search_latency --seed 1000000 --runs 200
+'''
+import argparse
+import os
+import random
+import time
+from sqlalchemy import desc, or_
+from api import create_app
+from api.models import db
+from api.models.business import Business, KEY_FIELDS
+from api.models.user import User
+from api.search import fold
+from api.search.backends import search_backend
+
+WORDS = ['coffee', 'rooftop', 'garage', 'bakery', 'pharmacy', 'studio',
+         'market', 'kitchen', 'salon', 'hotel', 'grill', 'books', 'motors',
+         'fitness', 'dental', 'printing', 'tailor', 'hardware', 'florist',
+         'laundry']
+CITIES = ['Nairobi', 'Kigali', 'Kampala', 'Mombasa', 'Arusha', 'Dodoma',
+          'Gisenyi', 'Huye', 'Entebbe', 'Kisumu']
+COUNTRIES = ['Kenya', 'Rwanda', 'Uganda', 'Tanzania']
+# (label, name argument): partial, whole and misspelled words
+TERMS = [('prefix', 'cof'), ('infix', 'arma'), ('word', 'bakery'),
+         ('two words', 'rooftop gril'), ('typo', 'phramacy')]
+
+
+def seed(count, batch_size=10000):
+    ''' Insert count synthetic businesses owned by the first user '''
+    user_id = db.session.query(User.id).order_by(User.id).limit(1).scalar()
+    if user_id is None:
+        raise SystemExit('Register a user first')
+    rows = []
+    for number in range(count):
+        row = {
+            'user_id': user_id,
+            'name': '{} {} {}'.format(random.choice(WORDS).title(),
+                                      random.choice(WORDS), number),
+            'description': ' '.join(random.sample(WORDS, 8)),
+            'category': random.choice(WORDS),
+            'city': random.choice(CITIES),
+            'country': random.choice(COUNTRIES),
+        }
+        # Bulk inserts skip the model hooks
+        for field in KEY_FIELDS:
+            row[field + '_key'] = fold(row[field])
+        rows.append(row)
+        if len(rows) == batch_size:
+            db.session.execute(Business.__table__.insert(), rows)
+            db.session.commit()
+            rows = []
+    if rows:
+        db.session.execute(Business.__table__.insert(), rows)
+        db.session.commit()
+
+
+def percentile(timings, percent):
+    ''' Nearest rank percentile '''
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def search_page(term, match, limit):
+    ''' First page of a searchAll listing search, as the view builds it '''
+    search = search_backend(match)
+    query = Business.listing().filter(or_(*[
+        search.match(column, term) for column in (
+            Business.name, Business.city, Business.category,
+            Business.country)]))
+    rank = search.rank([term])
+    if rank is not None:
+        query = query.order_by(desc(rank))
+    return query.order_by(desc(Business.created_at)).limit(limit).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Synthetic businesses to insert first')
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    app = create_app(os.getenv('ENV', 'development'))
+    with app.app_context():
+        if args.seed:
+            seed(args.seed)
+        print('{} businesses, {} backend'.format(
+            db.session.query(Business.id).count(),
+            search_backend().__name__))
+        for match in ('substring', 'similar'):
+            for label, term in TERMS:
+                timings = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    found = len(search_page(term, match, args.limit))
+                    timings.append((time.perf_counter() - started) * 1000)
+                    db.session.remove()
+                print('{:<9} {:<10} {:<14} {:>3} found  p50 {:>8.2f} ms  '
+                      'p99 {:>8.2f} ms'.format(
+                          match, label, repr(term), found,
+                          percentile(timings, 50), percentile(timings, 99)))
+
+
+if __name__ == '__main__':
+    main()
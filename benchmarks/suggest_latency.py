@@ -0,0 +1,74 @@
+'''
+    Benchmark typeahead suggestions: index size and build time, latency
+    (p50/p99) of first and repeated (cached) lookups per prefix length
+    and of the index upkeep of a business write
+
+    Seed synthetic businesses (see benchmarks.search_latency) and run:
+        python -m benchmarks.suggest_latency --seed 100000
+'''
+import argparse
+import os
+import random
+import time
+from api import create_app
+from api.models import db
+from api.models.business import Business
+from api.conf import suggest_index
+from api.search.backends import build_suggest_index
+from benchmarks.search_latency import seed, percentile
+
+
+def prefixes(length, count):
+    ''' Random prefixes of indexed words of a length '''
+    words = sorted({word[:length] for value in Business.suggest_rows()
+                    for text in value for word in text.lower().split()
+                    if len(word) >= length})
+    return random.sample(words, min(count, len(words)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Synthetic businesses to insert first')
+    parser.add_argument('--prefixes', type=int, default=200,
+                        help='Prefixes per length')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+    app = create_app(os.getenv('ENV', 'development'))
+    with app.app_context():
+        if args.seed:
+            seed(args.seed)
+        count = db.session.query(Business.id).count()
+        started = time.perf_counter()
+        build_suggest_index()
+        print('{} businesses: {values} values, {keys} keys, built in '
+              '{ms:.0f} ms'.format(
+                  count, ms=(time.perf_counter() - started) * 1000,
+                  **suggest_index.stats()))
+        for length in (1, 2, 3, 5):
+            texts = prefixes(length, args.prefixes)
+            for label in ('first', 'cached'):
+                timings = []
+                for text in texts:
+                    started = time.perf_counter()
+                    suggest_index.suggest(text, args.limit)
+                    timings.append((time.perf_counter() - started) * 1000)
+                print('{} letter prefixes {:<6}  p50 {:>7.3f} ms  '
+                      'p99 {:>7.3f} ms'.format(
+                          length, label, percentile(timings, 50),
+                          percentile(timings, 99)))
+            db.session.remove()
+        # Writes keep the ranked prefixes current
+        business = ('Coffee Corner', 'coffee', 'Kigali', 'Rwanda')
+        timings = []
+        for _ in range(args.prefixes):
+            started = time.perf_counter()
+            suggest_index.add(business)
+            suggest_index.remove(business)
+            timings.append((time.perf_counter() - started) * 1000)
+        print('add and remove a business  p50 {:>7.3f} ms  p99 {:>7.3f} '
+              'ms'.format(percentile(timings, 50), percentile(timings, 99)))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,17 +13,86 @@ class Config():
     JSON_SORT_KEYS = False
     # Configs loaded from env
     SECRET_KEY = os.getenv('SECRET_KEY')
+    # Comma separated keys still accepted when verifying tokens
+    RETIRED_SECRET_KEYS = [key for key in os.getenv(
+        'RETIRED_SECRET_KEYS', '').split(',') if key]
     MAIL_SERVER = os.getenv('MAIL_SERVER')
     MAIL_PORT = os.getenv('MAIL_PORT')
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('noreply@allconnect.herokuapp.com')
+    # Access token verification cache (entries, seconds)
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 4096))
+    TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
+    # Review authors usernames cache (entries, seconds)
+    USERNAME_CACHE_SIZE = int(os.getenv('USERNAME_CACHE_SIZE', 4096))
+    USERNAME_CACHE_TTL = int(os.getenv('USERNAME_CACHE_TTL', 3600))
+    # Public business and reviews responses cache (entries, seconds)
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+    # Exact listing totals reused by count=estimate (entries, seconds)
+    COUNT_CACHE_SIZE = int(os.getenv('COUNT_CACHE_SIZE', 1024))
+    COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 300))
+    # Businesses search: 'trigram' (PostgreSQL substrings), 'fulltext'
+    # (PostgreSQL words), 'memory' (in-process BM25 index, see
+    # BUILD_SEARCH_INDEXES), 'like' or 'auto' to pick trigram search on
+    # PostgreSQL
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+    # Build the in-process search indexes in the background from the
+    # first request: memory searches use SQL and suggestions answer 503
+    # until they are built. They are rebuilt every interval, 0 never
+    BUILD_SEARCH_INDEXES = os.getenv(
+        'BUILD_SEARCH_INDEXES', 'true').lower() == 'true'
+    SEARCH_INDEX_REBUILD_INTERVAL = int(
+        os.getenv('SEARCH_INDEX_REBUILD_INTERVAL', 0))
+    # Text search configuration of business documents and queries
+    SEARCH_TSCONFIG = os.getenv('SEARCH_TSCONFIG', 'english')
+    # Largest page of businesses listings
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+    # Token lifetimes (seconds)
+    TOKEN_EXPIRES_IN = int(os.getenv('TOKEN_EXPIRES_IN', 3600))
+    RESET_TOKEN_EXPIRES_IN = int(os.getenv('RESET_TOKEN_EXPIRES_IN', 86400))
+    # Expired tokens reaper, an interval of 0 disables the in-process job
+    TOKEN_REAPER_INTERVAL = int(os.getenv('TOKEN_REAPER_INTERVAL', 0))
+    TOKEN_REAPER_BATCH_SIZE = int(os.getenv('TOKEN_REAPER_BATCH_SIZE', 500))
+    # Seconds between logs of the in-process caches and pools counters,
+    # 0 disables
+    STATS_LOG_INTERVAL = int(os.getenv('STATS_LOG_INTERVAL', 0))
+    # Password hashing, see `flask calibrate-password-hash`
+    PASSWORD_HASH_METHOD = os.getenv(
+        'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:50000')
+    # 'thread' or 'process' pool
+    PASSWORD_HASH_EXECUTOR = os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    # Hashing requests waiting for a worker before answering 503. Keep
+    # workers + queue size below the server threads (10 in Procfile) so
+    # a login burst leaves threads for other endpoints
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 4))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', 30))
+    # Failed logins allowed per sliding window (seconds), 0 disables.
+    # Set LOGIN_RATE_STORAGE to a SQLite file to share counters between
+    # worker processes, each limiter keeps its own table there
+    LOGIN_EMAIL_RATE_LIMIT = int(os.getenv('LOGIN_EMAIL_RATE_LIMIT', 5))
+    LOGIN_EMAIL_RATE_PERIOD = int(os.getenv('LOGIN_EMAIL_RATE_PERIOD', 300))
+    LOGIN_EMAIL_RATE_STORAGE = os.getenv('LOGIN_RATE_STORAGE')
+    LOGIN_IP_RATE_LIMIT = int(os.getenv('LOGIN_IP_RATE_LIMIT', 30))
+    LOGIN_IP_RATE_PERIOD = int(os.getenv('LOGIN_IP_RATE_PERIOD', 60))
+    LOGIN_IP_RATE_STORAGE = os.getenv('LOGIN_RATE_STORAGE')
+    # Proxies in front of the app whose X-Forwarded-For is trusted for
+    # the client address, 0 when clients connect directly
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 0))
 
 
 class ProductionConfig(Config):
     DEVELOPMENT = False
     DEBUG = False
     TESTING = False
+    TOKEN_REAPER_INTERVAL = int(os.getenv('TOKEN_REAPER_INTERVAL', 600))
+    STATS_LOG_INTERVAL = int(os.getenv('STATS_LOG_INTERVAL', 300))
+    SEARCH_INDEX_REBUILD_INTERVAL = int(
+        os.getenv('SEARCH_INDEX_REBUILD_INTERVAL', 3600))
+    # The Heroku router appends the client address
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 1))
     # SQLAlchemy Config
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -46,6 +115,7 @@ class TestingConfig(Config):
     TESTING = True
     # SQLAlchemy Config
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI') + '_test'
+    BUILD_SEARCH_INDEXES = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
 
@@ -0,0 +1,25 @@
+"""Index businesses by keyset pagination order
+
+Revision ID: 1f7b2c8e9d30
+Revises: a3c9d47e1f52
+Create Date: 2026-10-17 14:31:07.215946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f7b2c8e9d30'
+down_revision = 'a3c9d47e1f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_businesses_created_at_id', 'businesses',
+                    ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_businesses_created_at_id', table_name='businesses')
@@ -0,0 +1,70 @@
+"""Add hashed lookup columns for secret tokens
+
+Revision ID: 40840d24d070
+Revises: 7da5268ab62a
+Create Date: 2026-10-17 09:12:41.204117
+
+"""
+import hashlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '40840d24d070'
+down_revision = '7da5268ab62a'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+# (table, secret column, digest column, unique)
+TOKEN_COLUMNS = [
+    ('access_tokens', 'access_token', 'access_token_digest', True),
+    ('password_reset_tokens', 'reset_token', 'reset_token_digest', True),
+    ('users', 'activation_token', 'activation_token_digest', False),
+]
+
+
+def backfill(table_name, column_name, digest_name, unique):
+    ''' Fill digest column in batches, dropping duplicated secrets '''
+    bind = op.get_bind()
+    table = sa.table(table_name, sa.column('id', sa.Integer),
+                     sa.column(column_name, sa.String),
+                     sa.column(digest_name, sa.String))
+    seen = set()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select([table.c.id, table.c[column_name]])
+            .where(table.c.id > last_id)
+            .where(table.c[column_name].isnot(None))
+            .order_by(table.c.id).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        for row_id, secret in rows:
+            digest = hashlib.sha256(secret.encode('utf-8')).hexdigest()
+            if unique and digest in seen:
+                bind.execute(table.delete().where(table.c.id == row_id))
+                continue
+            seen.add(digest)
+            bind.execute(table.update().where(table.c.id == row_id)
+                         .values({digest_name: digest}))
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    for table_name, column_name, digest_name, unique in TOKEN_COLUMNS:
+        op.add_column(table_name, sa.Column(
+            digest_name, sa.String(length=64), nullable=True))
+        backfill(table_name, column_name, digest_name, unique)
+        op.create_index(op.f('ix_{}_{}'.format(table_name, digest_name)),
+                        table_name, [digest_name], unique=unique)
+        if unique:
+            op.alter_column(table_name, digest_name, nullable=False)
+
+
+def downgrade():
+    for table_name, _, digest_name, _ in reversed(TOKEN_COLUMNS):
+        op.drop_index(op.f('ix_{}_{}'.format(table_name, digest_name)),
+                      table_name=table_name)
+        op.drop_column(table_name, digest_name)
@@ -0,0 +1,71 @@
+"""Add accent and case folded search keys to businesses
+
+Revision ID: 4b9e1d7c2a63
+Revises: 8d41f6a3b2c5
+Create Date: 2026-10-17 16:21:09.384715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from text_unidecode import unidecode
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9e1d7c2a63'
+down_revision = '8d41f6a3b2c5'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+FIELDS = ['name', 'category', 'city', 'country']
+
+
+def fold(text):
+    ''' Same folding as api.search.fold '''
+    return unidecode(text or '').lower()
+
+
+def upgrade():
+    for field in FIELDS:
+        op.add_column('businesses', sa.Column(
+            field + '_key', sa.Text(), nullable=True))
+    bind = op.get_bind()
+    businesses = sa.table('businesses', sa.column('id'), *[
+        sa.column(name) for field in FIELDS
+        for name in (field, field + '_key')])
+    max_id = bind.execute(sa.text("SELECT max(id) FROM businesses")).scalar()
+    for first_id in range(0, max_id or 0, BATCH_SIZE):
+        rows = bind.execute(sa.select(
+            [businesses.c.id] + [businesses.c[field] for field in FIELDS]
+        ).where(sa.and_(businesses.c.id > first_id,
+                        businesses.c.id <= first_id + BATCH_SIZE))).fetchall()
+        if rows:
+            bind.execute(businesses.update().where(
+                businesses.c.id == sa.bindparam('row_id')
+            ).values(**{field + '_key': sa.bindparam(field + '_key')
+                        for field in FIELDS}), [
+                dict({field + '_key': fold(row[field]) for field in FIELDS},
+                     row_id=row.id) for row in rows])
+    for field in FIELDS:
+        op.alter_column('businesses', field + '_key', nullable=False)
+        op.drop_index('ix_businesses_{}_trgm'.format(field),
+                      table_name='businesses')
+        op.create_index('ix_businesses_{}_key_trgm'.format(field),
+                        'businesses', [field + '_key'], unique=False,
+                        postgresql_using='gin',
+                        postgresql_ops={field + '_key': 'gin_trgm_ops'})
+        op.create_index('ix_businesses_user_id_{}_key'.format(field),
+                        'businesses', ['user_id', field + '_key'],
+                        unique=False)
+
+
+def downgrade():
+    for field in reversed(FIELDS):
+        op.drop_index('ix_businesses_user_id_{}_key'.format(field),
+                      table_name='businesses')
+        op.drop_index('ix_businesses_{}_key_trgm'.format(field),
+                      table_name='businesses')
+        op.create_index('ix_businesses_{}_trgm'.format(field), 'businesses',
+                        [field], unique=False, postgresql_using='gin',
+                        postgresql_ops={field: 'gin_trgm_ops'})
+        op.drop_column('businesses', field + '_key')
@@ -0,0 +1,56 @@
+"""Store public ids of businesses, reviews and users
+
+Revision ID: 5ea9a5a9b170
+Revises: 989bacccb96f
+Create Date: 2026-10-17 11:26:05.731942
+
+"""
+from alembic import op
+from flask import current_app
+from hashids import Hashids
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5ea9a5a9b170'
+down_revision = '989bacccb96f'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+TABLES = ['users', 'businesses', 'reviews']
+
+
+def backfill(table_name, codec):
+    ''' Fill public ids with the hashids already issued '''
+    bind = op.get_bind()
+    table = sa.table(table_name, sa.column('id', sa.Integer),
+                     sa.column('public_id', sa.String))
+    last_id = 0
+    while True:
+        ids = [row[0] for row in bind.execute(
+            sa.select([table.c.id]).where(table.c.id > last_id)
+            .order_by(table.c.id).limit(BATCH_SIZE))]
+        if not ids:
+            break
+        for row_id in ids:
+            bind.execute(table.update().where(table.c.id == row_id)
+                         .values(public_id=codec.encode(row_id)))
+        last_id = ids[-1]
+
+
+def upgrade():
+    codec = Hashids(salt=current_app.config['SECRET_KEY'], min_length=34)
+    for table_name in TABLES:
+        op.add_column(table_name, sa.Column(
+            'public_id', sa.String(length=64), nullable=True))
+        backfill(table_name, codec)
+        op.create_index(op.f('ix_{}_public_id'.format(table_name)),
+                        table_name, ['public_id'], unique=True)
+
+
+def downgrade():
+    for table_name in reversed(TABLES):
+        op.drop_index(op.f('ix_{}_public_id'.format(table_name)),
+                      table_name=table_name)
+        op.drop_column(table_name, 'public_id')
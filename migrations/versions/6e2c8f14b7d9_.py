@@ -0,0 +1,30 @@
+"""Store a businesses listings version for listing ETags
+
+Revision ID: 6e2c8f14b7d9
+Revises: 4b9e1d7c2a63
+Create Date: 2026-10-17 17:02:45.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2c8f14b7d9'
+down_revision = '4b9e1d7c2a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    listing_versions = op.create_table(
+        'listing_versions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0',
+                  nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+    op.bulk_insert(listing_versions, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('listing_versions')
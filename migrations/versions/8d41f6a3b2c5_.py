@@ -0,0 +1,32 @@
+"""Add trigram indexes for businesses substring search
+
+Revision ID: 8d41f6a3b2c5
+Revises: c58e04b7a912
+Create Date: 2026-10-17 15:47:31.560218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f6a3b2c5'
+down_revision = 'c58e04b7a912'
+branch_labels = None
+depends_on = None
+
+FIELDS = ['name', 'category', 'city', 'country']
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in FIELDS:
+        op.create_index('ix_businesses_{}_trgm'.format(field), 'businesses',
+                        [field], unique=False, postgresql_using='gin',
+                        postgresql_ops={field: 'gin_trgm_ops'})
+
+
+def downgrade():
+    for field in reversed(FIELDS):
+        op.drop_index('ix_businesses_{}_trgm'.format(field),
+                      table_name='businesses')
@@ -0,0 +1,41 @@
+"""Set real token expiry timestamps and index them
+
+Revision ID: 989bacccb96f
+Revises: 40840d24d070
+Create Date: 2026-10-17 10:03:27.518820
+
+"""
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '989bacccb96f'
+down_revision = '40840d24d070'
+branch_labels = None
+depends_on = None
+
+# (table, lifetime config)
+TOKEN_TABLES = [
+    ('access_tokens', 'TOKEN_EXPIRES_IN'),
+    ('password_reset_tokens', 'RESET_TOKEN_EXPIRES_IN'),
+]
+
+
+def upgrade():
+    for table_name, lifetime_config in TOKEN_TABLES:
+        # Rows saved so far got expires_at = created_at
+        op.execute(sa.text(
+            "UPDATE {} SET expires_at = created_at + "
+            "make_interval(secs => :lifetime) "
+            "WHERE expires_at <= created_at".format(table_name)
+        ).bindparams(lifetime=current_app.config[lifetime_config]))
+        op.create_index(op.f('ix_{}_expires_at'.format(table_name)),
+                        table_name, ['expires_at'], unique=False)
+
+
+def downgrade():
+    for table_name, _ in reversed(TOKEN_TABLES):
+        op.drop_index(op.f('ix_{}_expires_at'.format(table_name)),
+                      table_name=table_name)
@@ -0,0 +1,40 @@
+"""Stop storing raw access and reset tokens
+
+Revision ID: 9c3a5e7b1d48
+Revises: 6e2c8f14b7d9
+Create Date: 2026-10-17 18:24:09.573120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3a5e7b1d48'
+down_revision = '6e2c8f14b7d9'
+branch_labels = None
+depends_on = None
+
+# (table, raw token column), rows are looked up by the token digest
+TOKEN_COLUMNS = [
+    ('access_tokens', 'access_token'),
+    ('password_reset_tokens', 'reset_token'),
+]
+
+
+def upgrade():
+    for table_name, column_name in TOKEN_COLUMNS:
+        op.alter_column(table_name, column_name, existing_type=sa.String(),
+                        nullable=True)
+        op.execute(sa.table(table_name, sa.column(column_name, sa.String))
+                   .update().values({column_name: None}))
+
+
+def downgrade():
+    # Cleared tokens cannot be restored, their rows can no longer be used
+    # by the previous code
+    for table_name, column_name in TOKEN_COLUMNS:
+        table = sa.table(table_name, sa.column(column_name, sa.String))
+        op.execute(table.delete().where(table.c[column_name].is_(None)))
+        op.alter_column(table_name, column_name, existing_type=sa.String(),
+                        nullable=False)
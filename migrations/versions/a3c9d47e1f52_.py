@@ -0,0 +1,25 @@
+"""Index reviews by business
+
+Revision ID: a3c9d47e1f52
+Revises: e02b6fab858d
+Create Date: 2026-10-17 13:52:18.604731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9d47e1f52'
+down_revision = 'e02b6fab858d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_reviews_business_id'), 'reviews',
+                    ['business_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_reviews_business_id'), table_name='reviews')
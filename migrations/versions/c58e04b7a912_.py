@@ -0,0 +1,48 @@
+"""Add weighted full text search document to businesses
+
+Revision ID: c58e04b7a912
+Revises: 1f7b2c8e9d30
+Create Date: 2026-10-17 15:08:44.917352
+
+"""
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c58e04b7a912'
+down_revision = '1f7b2c8e9d30'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+# Same weights as api.models.business.SEARCH_WEIGHTS
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector(:config, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector(:config, coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector(:config, coalesce(city, '')), 'C') || "
+    "setweight(to_tsvector(:config, coalesce(country, '')), 'C') || "
+    "setweight(to_tsvector(:config, coalesce(description, '')), 'D')"
+)
+
+
+def upgrade():
+    op.add_column('businesses', sa.Column(
+        'search_vector', postgresql.TSVECTOR(), nullable=True))
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT max(id) FROM businesses")).scalar()
+    for first_id in range(0, max_id or 0, BATCH_SIZE):
+        bind.execute(sa.text(
+            "UPDATE businesses SET search_vector = " + SEARCH_DOCUMENT +
+            " WHERE id > :first_id AND id <= :last_id"
+        ).bindparams(config=current_app.config['SEARCH_TSCONFIG'],
+                     first_id=first_id, last_id=first_id + BATCH_SIZE))
+    op.create_index('ix_businesses_search_vector', 'businesses',
+                    ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_businesses_search_vector', table_name='businesses')
+    op.drop_column('businesses', 'search_vector')
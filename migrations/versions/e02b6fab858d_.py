@@ -0,0 +1,34 @@
+"""Denormalize business reviews count
+
+Revision ID: e02b6fab858d
+Revises: 5ea9a5a9b170
+Create Date: 2026-10-17 12:40:52.190384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e02b6fab858d'
+down_revision = '5ea9a5a9b170'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('businesses', sa.Column(
+        'reviews_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE businesses SET reviews_count = counts.reviews_count "
+        "FROM (SELECT business_id, count(*) AS reviews_count FROM reviews "
+        "GROUP BY business_id) AS counts "
+        "WHERE businesses.id = counts.business_id")
+    op.create_index(op.f('ix_businesses_reviews_count'), 'businesses',
+                    ['reviews_count'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_businesses_reviews_count'),
+                  table_name='businesses')
+    op.drop_column('businesses', 'reviews_count')
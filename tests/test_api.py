@@ -2,6 +2,8 @@
     Main test file
 '''
 import unittest
+from contextlib import contextmanager
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash
 from api import create_app
 from api.models.user import User
@@ -145,6 +147,22 @@ class MainTests(unittest.TestCase):
         self.business_data['hashid'] = business.hashid()
         self.business_data['id'] = business.id
 
+    @contextmanager
+    def count_queries(self):
+        '''
+            Count SQL statements run inside the block
+        '''
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            ''' Record statement '''
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_execute)
+
     def tearDown(self):
         with self.app_context:
             db.session.remove()
@@ -1,10 +1,14 @@
 '''
     Business features tests
 '''
+from datetime import datetime
 from flask import json
 from tests.test_api import MainTests
 from api.models import db
 from api.models.business import Business
+from api.models.listing_version import ListingVersion
+from api.helpers import hashid
+from api.conf import response_cache, count_cache
 
 
 class BusinessTests(MainTests):
@@ -381,3 +385,269 @@ class BusinessTests(MainTests):
         self.assertEqual(response.status_code, 400)
         self.assertIn(
             b'Business not found', response.data)
+
+    def test_business_public_id(self):
+        '''
+            Test business public id is stored and legacy ids still work
+        '''
+        self.add_business()
+        business = Business.query.get(self.business_data['id'])
+        self.assertEqual(business.public_id, hashid(business.id))
+        Business.query.filter_by(id=business.id).update({'public_id': None})
+        db.session.commit()
+        response = self.app.get(
+            self.url_prefix + 'businesses/' + self.business_data['hashid'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_queries(self):
+        '''
+            Test listing runs the same number of queries for any page size
+        '''
+        with self.count_queries() as one_business:
+            self.app.get(self.url_prefix + 'businesses')
+        for _ in range(3):
+            self.add_business()
+        with self.count_queries() as many_businesses:
+            response = self.app.get(self.url_prefix + 'businesses')
+        self.assertEqual(len(json.loads(response.data)['businesses']), 4)
+        self.assertEqual(len(one_business), len(many_businesses))
+
+    def test_business_fields(self):
+        '''
+            Test listing and business details with sparse fieldsets
+        '''
+        self.add_business()
+        response = self.app.get(
+            self.url_prefix + 'businesses?fields=id,name,city,category')
+        self.assertEqual(response.status_code, 200)
+        business = json.loads(response.data)['businesses'][0]
+        self.assertEqual(
+            set(business), {'id', 'name', 'city', 'category'})
+        response = self.app.get(
+            self.url_prefix + 'businesses/' + self.business_data['hashid'] +
+            '?fields=id,reviews_count')
+        self.assertEqual(
+            set(json.loads(response.data)['business']),
+            {'id', 'reviews_count'})
+
+    def test_invalid_business_fields(self):
+        '''
+            Test listing with unknown fields
+        '''
+        response = self.app.get(
+            self.url_prefix + 'businesses?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'Invalid fields', response.data)
+
+    def test_business_response_cache(self):
+        '''
+            Test business details are cached until the business changes
+        '''
+        self.add_business()
+        url = self.url_prefix + 'businesses/' + self.business_data['hashid']
+        self.assertEqual(self.app.get(url).headers['X-Cache'], 'MISS')
+        with self.count_queries() as statements:
+            response = self.app.get(url)
+        self.assertEqual(response.headers['X-Cache'], 'HIT')
+        self.assertEqual(len(statements), 0)
+        self.assertEqual(response_cache.stats()['hits'], 1)
+        self.assertGreater(response_cache.stats()['bytes'], 0)
+        self.app.put(url, data=json.dumps(dict(
+            self.business_data, name='TRM')),
+            headers={'Authorization': self.test_token})
+        response = self.app.get(url)
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(json.loads(response.data)['business']['name'], 'TRM')
+
+    def test_business_not_modified(self):
+        '''
+            Test business polling answers 304 until the business changes
+        '''
+        self.add_business()
+        business = Business.query.get(self.business_data['id'])
+        business.updated_at = datetime(2018, 1, 1)
+        db.session.commit()
+        url = self.url_prefix + 'businesses/' + self.business_data['hashid']
+        response = self.app.get(url)
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Last-Modified'],
+                         'Mon, 01 Jan 2018 00:00:00 GMT')
+        # Served from the response cache
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.app.get(url, headers={
+            'If-Modified-Since': 'Mon, 01 Jan 2018 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 304)
+        self.app.put(url, data=json.dumps(dict(
+            self.business_data, name='TRM')),
+            headers={'Authorization': self.test_token})
+        self.assertGreater(Business.query.get(
+            self.business_data['id']).updated_at, datetime(2018, 1, 1))
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_not_modified(self):
+        '''
+            Test businesses listing answers 304 until businesses change
+        '''
+        url = self.url_prefix + 'businesses?limit=5'
+        etag = self.app.get(url).headers['ETag']
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.add_business()
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_version_after_commit(self):
+        '''
+            Test the listings version only follows committed writes
+        '''
+        version = ListingVersion.current()
+        db.session.add(Business(
+            user_id=self.sample_user['id'], name='Rolled back',
+            description=self.business_data['description'],
+            category=self.business_data['category'],
+            country=self.business_data['country'],
+            city=self.business_data['city']))
+        db.session.flush()
+        self.assertEqual(ListingVersion.current(), version)
+        db.session.rollback()
+        db.session.commit()
+        self.assertEqual(ListingVersion.current(), version)
+        self.add_business()
+        self.assertEqual(ListingVersion.current(), version + 1)
+
+    def add_dated_businesses(self, dates):
+        '''
+            Add businesses created at the given dates
+        '''
+        for number, created_at in enumerate(dates):
+            db.session.add(Business(
+                user_id=self.sample_user['id'],
+                name='Business {}'.format(number),
+                description=self.business_data['description'],
+                category=self.business_data['category'],
+                country=self.business_data['country'],
+                city=self.business_data['city'],
+                created_at=created_at,
+            ))
+        db.session.commit()
+
+    def test_cursor_pagination(self):
+        '''
+            Test walking businesses with cursors, including equal dates
+        '''
+        same_day = datetime(2018, 1, 2)
+        self.add_dated_businesses(
+            [datetime(2018, 1, 1), same_day, same_day, same_day,
+             datetime(2018, 1, 3)])
+        names = []
+        cursor = ''
+        while cursor is not None:
+            response = json.loads(self.app.get(
+                self.url_prefix + 'businesses?limit=2&fields=name&cursor=' +
+                cursor).data)
+            self.assertLessEqual(len(response['businesses']), 2)
+            names.extend(business['name']
+                         for business in response['businesses'])
+            cursor = response['next_cursor']
+        # Sample business of the test setup is the newest
+        self.assertEqual(names, ['KFC', 'Business 4', 'Business 3',
+                                 'Business 2', 'Business 1', 'Business 0'])
+
+    def test_user_businesses_cursor(self):
+        '''
+            Test user businesses cursor pages
+        '''
+        self.add_dated_businesses([datetime(2018, 1, 1), datetime(2018, 1, 2)])
+        response = json.loads(self.app.get(
+            self.url_prefix + 'account/businesses?limit=2&cursor=',
+            headers={'Authorization': self.test_token}).data)
+        self.assertEqual(len(response['businesses']), 2)
+        response = json.loads(self.app.get(
+            self.url_prefix + 'account/businesses?limit=5&cursor=' +
+            response['next_cursor'],
+            headers={'Authorization': self.test_token}).data)
+        self.assertEqual([business['name'] for business in
+                          response['businesses']],
+                         ['Business 0'])
+        self.assertIsNone(response['next_cursor'])
+
+    def test_invalid_cursor(self):
+        '''
+            Test listing with a cursor that was not issued by the API
+        '''
+        response = self.app.get(self.url_prefix + 'businesses?cursor=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'Invalid cursor', response.data)
+
+    def test_max_page_size(self):
+        '''
+            Test page size is capped by MAX_PAGE_SIZE
+        '''
+        self.main.config['MAX_PAGE_SIZE'] = 2
+        self.add_dated_businesses([datetime(2018, 1, 1), datetime(2018, 1, 2)])
+        for query in ('limit=50', 'limit=50&cursor='):
+            response = json.loads(self.app.get(
+                self.url_prefix + 'businesses?' + query).data)
+            self.assertEqual(len(response['businesses']), 2)
+
+    def test_listing_total_single_statement(self):
+        '''
+            Test page rows and totals come from one statement
+        '''
+        self.add_dated_businesses([datetime(2018, 1, 1), datetime(2018, 1, 2)])
+        with self.count_queries() as statements:
+            response = json.loads(self.app.get(
+                self.url_prefix + 'businesses?limit=2&page=2').data)
+        self.assertEqual(response['total_businesses'], 3)
+        self.assertEqual(response['pages'], 2)
+        self.assertEqual(response['previous_page'], 1)
+        self.assertIsNone(response['next_page'])
+        self.assertEqual(len(response['businesses']), 1)
+        # Stored listings version lookup and the page query
+        self.assertEqual(len(statements), 2)
+        self.assertIn('FROM listing_versions', statements[0])
+        response = self.app.get(self.url_prefix + 'businesses?page=3')
+        self.assertEqual(response.status_code, 404)
+
+    def test_estimated_count(self):
+        '''
+            Test count=estimate reuses exact totals and never counts rows
+            when one is cached
+        '''
+        self.add_dated_businesses([datetime(2018, 1, 1), datetime(2018, 1, 2)])
+        url = self.url_prefix + 'businesses?limit=2&name=business'
+        response = json.loads(self.app.get(url).data)
+        self.assertEqual(response['total_businesses'], 2)
+        self.assertTrue(response['total_exact'])
+        self.add_dated_businesses([datetime(2018, 1, 3)])
+        response = json.loads(self.app.get(url).data)
+        self.assertEqual(response['total_businesses'], 3)
+        with self.count_queries() as statements:
+            response = json.loads(self.app.get(
+                url + '&count=estimate&fields=name').data)
+        self.assertEqual(response['total_businesses'], 3)
+        self.assertEqual(response['pages'], 2)
+        self.assertTrue(response['total_exact'])
+        # Stored listings version lookup and the page query, neither
+        # counts rows
+        self.assertEqual(len(statements), 2)
+        self.assertEqual([statement for statement in statements
+                          if 'count(' in statement.lower()], [])
+        # A padded term filters differently, its total is not reused
+        hits = count_cache.stats()['hits']
+        self.app.get(self.url_prefix + 'businesses?limit=2&name=%20business'
+                     '&count=estimate')
+        self.assertEqual(count_cache.stats()['hits'], hits)
+        response = self.app.get(url + '&count=estimate&page=3')
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_count(self):
+        '''
+            Test listing with an unknown count mode
+        '''
+        response = self.app.get(self.url_prefix + 'businesses?count=some')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'Invalid count', response.data)
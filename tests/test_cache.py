@@ -0,0 +1,71 @@
+'''
+    In-process cache tests
+'''
+import unittest
+from flask import Flask
+from api.cache import TTLCache
+from api.conf import count_cache
+from api.metrics import process_stats, start_stats_logger
+
+
+class CacheTests(unittest.TestCase):
+    '''
+        TTL/LRU cache tests class
+    '''
+
+    def test_lru_eviction(self):
+        '''
+            Test least recently used entries are evicted first
+        '''
+        cache = TTLCache('TEST_CACHE', maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_expired_entries(self):
+        '''
+            Test entries are not returned after their ttl
+        '''
+        cache = TTLCache('TEST_CACHE', maxsize=2, ttl=60)
+        cache.set('a', 1, ttl=-1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_hit_miss_counters(self):
+        '''
+            Test cache hits and misses are counted
+        '''
+        cache = TTLCache('TEST_CACHE', maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.5)
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_process_stats(self):
+        '''
+            Test the logged counters are the live ones of this process
+        '''
+        count_cache.set('stats-test', 1)
+        self.addCleanup(count_cache.clear)
+        hits = process_stats()['count_cache']['hits']
+        count_cache.get('stats-test')
+        self.assertEqual(process_stats()['count_cache']['hits'], hits + 1)
+        self.assertIn('password_hasher', process_stats())
+
+    def test_stats_logger_disabled(self):
+        '''
+            Test no stats logger runs without an interval
+        '''
+        app = Flask(__name__)
+        app.config['STATS_LOG_INTERVAL'] = 0
+        self.assertIsNone(start_stats_logger(app))
+        self.assertNotIn('stats_logger', app.extensions)
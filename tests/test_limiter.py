@@ -0,0 +1,85 @@
+'''
+    Rate limiter tests
+'''
+import os
+import tempfile
+import unittest
+from flask import Flask
+from api.limiter import SlidingWindowLimiter, MemoryBackend, SQLiteBackend
+
+
+class LimiterTests(unittest.TestCase):
+    '''
+        Sliding window limiter tests class
+    '''
+
+    def limiter(self, backend):
+        ''' Limiter allowing 2 hits per 60 seconds '''
+        limiter = SlidingWindowLimiter('TEST_RATE')
+        limiter.limit = 2
+        limiter.period = 60
+        limiter.backend = backend
+        return limiter
+
+    def check_sliding_window(self, backend):
+        ''' Previous window hits fade out as the window slides '''
+        limiter = self.limiter(backend)
+        limiter.hit(['a'], now=30)
+        self.assertEqual(limiter.retry_after(['a'], now=31), 0)
+        limiter.hit(['a'], now=31)
+        self.assertEqual(limiter.retry_after(['a'], now=32), 28)
+        # Half of the previous window still counts
+        self.assertEqual(limiter.count('a', now=90), 1)
+        self.assertEqual(limiter.retry_after(['a'], now=90), 0)
+        self.assertEqual(limiter.count('a', now=150), 0)
+        limiter.reset('a')
+        self.assertEqual(limiter.count('a', now=32), 0)
+
+    def test_memory_backend(self):
+        '''
+            Test limiting with per-process counters
+        '''
+        self.check_sliding_window(MemoryBackend())
+
+    def test_memory_backend_eviction(self):
+        '''
+            Test least recently used counters are evicted
+        '''
+        limiter = self.limiter(MemoryBackend(max_keys=1))
+        limiter.hit(['a', 'b'], now=30)
+        self.assertEqual(limiter.count('a', now=30), 0)
+        self.assertEqual(limiter.count('b', now=30), 1)
+
+    def test_sqlite_backend(self):
+        '''
+            Test limiting with counters shared through SQLite
+        '''
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        try:
+            self.check_sliding_window(SQLiteBackend(path))
+        finally:
+            os.remove(path)
+
+    def test_shared_sqlite_file(self):
+        '''
+            Test limiters with different periods sharing a file keep
+            their counters, and restarts keep them too
+        '''
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        app = Flask(__name__)
+        app.config.update(EMAIL_RATE_LIMIT=5, EMAIL_RATE_PERIOD=300,
+                          EMAIL_RATE_STORAGE=path, IP_RATE_LIMIT=30,
+                          IP_RATE_PERIOD=60, IP_RATE_STORAGE=path)
+        email = SlidingWindowLimiter('EMAIL_RATE')
+        email.init_app(app)
+        ip = SlidingWindowLimiter('IP_RATE')
+        ip.init_app(app)
+        email.hit(['a'], now=1000)
+        ip.hit(['a'], now=1000)
+        self.assertEqual(email.count('a', now=1000), 1)
+        self.assertEqual(ip.count('a', now=1000), 1)
+        email.init_app(app)
+        self.assertEqual(email.count('a', now=1000), 1)
@@ -4,7 +4,9 @@
 from flask import json
 from tests.test_api import MainTests
 from api.models.review import Review
+from api.models.business import Business
 from api.models import db
+from api.conf import response_cache
 
 
 class ReviewTests(MainTests):
@@ -116,3 +118,106 @@ class ReviewTests(MainTests):
         self.assertEqual(response.status_code, 400)
         self.assertIn(
             b'business doesn\'t exist', response.data)
+
+    def test_reviews_count(self):
+        '''
+            Test stored reviews count follows added reviews
+        '''
+        self.add_business()
+        for _ in range(2):
+            self.app.post(
+                self.url_prefix + 'businesses/' +
+                self.business_data['hashid'] + '/reviews',
+                data=json.dumps({
+                    'review': 'We enjoy your coffee',
+                }), headers={'Authorization': self.test_token})
+        response = self.app.get(
+            self.url_prefix + 'businesses/' + self.business_data['hashid'])
+        self.assertEqual(
+            json.loads(response.data)['business']['reviews_count'], 2)
+        Business.query.filter_by(id=self.business_data['id']).update(
+            {'reviews_count': 5})
+        db.session.commit()
+        self.assertEqual(Business.reconcile_reviews_counts(batch_size=1), 1)
+        self.assertEqual(
+            Business.query.get(self.business_data['id']).reviews_count, 2)
+
+    def test_business_reviews_queries(self):
+        '''
+            Test reviews and their authors are loaded with two queries,
+            after the ETag version query
+        '''
+        self.add_business()
+        for user_id in (self.sample_user['id'], self.orphan_id):
+            db.session.add(Review(
+                user_id=user_id,
+                business_id=self.business_data['id'],
+                description="Awesome! We love it",
+            ))
+        db.session.commit()
+        with self.count_queries() as statements:
+            response = self.app.get(
+                self.url_prefix + 'businesses/' +
+                self.business_data['hashid'] + '/reviews')
+        self.assertEqual(len(json.loads(response.data)['reviews']), 2)
+        self.assertEqual(len(statements), 3)
+
+    def test_business_reviews_fields(self):
+        '''
+            Test retrieving business reviews with sparse fieldsets
+        '''
+        self.add_business()
+        db.session.add(Review(
+            user_id=self.sample_user['id'],
+            business_id=self.business_data['id'],
+            description="Awesome! We love it",
+        ))
+        db.session.commit()
+        response = self.app.get(
+            self.url_prefix + 'businesses/' +
+            self.business_data['hashid'] + '/reviews?fields=id,description')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(json.loads(response.data)['reviews'][0]),
+            {'id', 'description'})
+
+    def test_reviews_response_cache(self):
+        '''
+            Test a new review invalidates cached business pages
+        '''
+        self.add_business()
+        url = self.url_prefix + 'businesses/' + self.business_data['hashid']
+        self.app.get(url)
+        self.app.get(url + '/reviews')
+        self.assertEqual(self.app.get(url).headers['X-Cache'], 'HIT')
+        self.app.post(url + '/reviews', data=json.dumps({
+            'review': 'Awesome! We love it'
+        }), headers={'Authorization': self.test_token})
+        response = self.app.get(url + '/reviews')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(len(json.loads(response.data)['reviews']), 1)
+        response = self.app.get(url)
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(
+            json.loads(response.data)['business']['reviews_count'], 1)
+
+    def test_reviews_not_modified(self):
+        '''
+            Test reviews polling answers 304 until a review is added
+        '''
+        self.add_business()
+        url = (self.url_prefix + 'businesses/' +
+               self.business_data['hashid'] + '/reviews')
+        etag = self.app.get(url).headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response_cache.clear()
+        with self.count_queries() as statements:
+            response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.app.post(url, data=json.dumps({
+            'review': 'Awesome! We love it'
+        }), headers={'Authorization': self.test_token})
+        response = self.app.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
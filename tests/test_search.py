@@ -0,0 +1,296 @@
+'''
+    Businesses search tests
+'''
+from unittest import mock
+from flask import json
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects import postgresql
+from tests.test_api import MainTests
+from api.models import db
+from api.models.business import Business
+from api.search.index import InvertedIndex
+from api.search.fuzzy import FuzzyIndex, NgramIndex, edit_distance
+from api.search.suggest import SuggestIndex
+from api.conf import search_index, fuzzy_index, suggest_index
+from api.search.backends import (
+    search_backend, LikeSearch, FullTextSearch, TrigramSearch,
+    TrigramSimilaritySearch, TRIGRAM_VERSIONS, word_similarity_supported,
+    build_search_index, build_fuzzy_index, build_suggest_index,
+    build_indexes)
+
+
+class SearchTests(MainTests):
+    '''
+        Search backends tests class
+    '''
+
+    def test_auto_backend(self):
+        '''
+            Test auto picks trigram search on PostgreSQL, substring search
+            elsewhere, and full text search only when configured
+        '''
+        self.assertIs(search_backend(), LikeSearch)
+        self.assertIs(search_backend('similar'), LikeSearch)
+        self.main.config['SEARCH_BACKEND'] = 'fulltext'
+        self.assertIs(search_backend(), FullTextSearch)
+
+    def test_word_similarity_support(self):
+        '''
+            Test word similarity needs pg_trgm 1.2
+        '''
+        url = str(db.session.get_bind().url)
+        self.addCleanup(TRIGRAM_VERSIONS.pop, url)
+        TRIGRAM_VERSIONS[url] = (1, 1)
+        self.assertFalse(word_similarity_supported())
+        TRIGRAM_VERSIONS[url] = (1, 3)
+        self.assertTrue(word_similarity_supported())
+        TRIGRAM_VERSIONS[url] = ()
+        self.assertFalse(word_similarity_supported())
+
+    def test_fulltext_field_match(self):
+        '''
+            Test field searches use the document index and the field weight
+        '''
+        query = Business.listing(['name']).filter(
+            FullTextSearch.match(Business.city, 'Nairobi'))
+        sql = str(query.statement.compile(dialect=postgresql.dialect()))
+        self.assertIn('businesses.search_vector @@ plainto_tsquery', sql)
+        self.assertIn('ts_filter(businesses.search_vector', sql)
+        params = query.statement.compile(dialect=postgresql.dialect()).params
+        self.assertIn('{c}', params.values())
+
+    def test_like_search(self):
+        '''
+            Test substring search keeps working without PostgreSQL
+        '''
+        self.add_business()
+        names = [row.name for row in Business.listing(['name']).filter(
+            LikeSearch.match(Business.name, 'rooftop')).all()]
+        self.assertEqual(names, [self.business_data['name']])
+
+    def test_trigram_match(self):
+        '''
+            Test substring searches compare the indexed search keys
+        '''
+        query = Business.listing(['name']).filter(
+            TrigramSearch.match(Business.city, 'Nair'))
+        compiled = query.statement.compile(dialect=postgresql.dialect())
+        self.assertIn('WHERE businesses.city_key LIKE', str(compiled))
+        self.assertIn('%nair%', compiled.params.values())
+        sql = str(Business.listing(['name']).filter(
+            TrigramSimilaritySearch.match(Business.city, 'nairobu')
+        ).order_by(TrigramSimilaritySearch.rank(['nairobu'])).statement
+            .compile(dialect=postgresql.dialect()))
+        self.assertIn('<% businesses.city_key', sql)
+        self.assertIn('ORDER BY greatest(word_similarity(', sql)
+
+    def test_trigram_search_listing(self):
+        '''
+            Test partial words still find businesses
+        '''
+        self.add_business()
+        self.main.config['SEARCH_BACKEND'] = 'trigram'
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?name=ROOFTOP%20cof').data)
+        self.assertEqual([business['name'] for business in
+                          response['businesses']],
+                         [self.business_data['name']])
+        response = self.app.get(self.url_prefix + 'businesses?match=exact')
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_ranking(self):
+        '''
+            Test BM25 ranking, field scoping and incremental updates
+        '''
+        index = InvertedIndex()
+        index.build([
+            (1, 'Java House', 'Coffee', 'Nairobi', 'Kenya', 'Coffee shop'),
+            (2, 'Coffee Coffee', 'Coffee', 'Kigali', 'Rwanda', 'Coffee'),
+            (3, 'Bourbon', 'Bar', 'Kigali', 'Rwanda', 'Coffee and wine'),
+        ])
+        self.assertEqual(index.search([[(['name', 'category'], 'coffee')]]),
+                         [2, 1])
+        self.assertEqual(index.search([[(['city'], 'kigali')],
+                                       [(['category'], 'bar')]]), [3])
+        self.assertEqual(index.search([[(['name'], 'java coffee')]]), [])
+        index.add(1, ('Java Coffee', 'Cafe', 'Nairobi', 'Kenya', ''))
+        self.assertEqual(index.search([[(['name'], 'java coffee')]]), [1])
+        self.assertEqual(index.search([[(['category'], 'coffee')]]), [2])
+        index.remove(2)
+        self.assertEqual(index.search([[(['name'], 'coffee')]]), [1])
+        self.assertEqual(index.stats()['documents'], 2)
+
+    def test_memory_search_listing(self):
+        '''
+            Test listings searched with the in-process index follow writes
+        '''
+        self.main.config['SEARCH_BACKEND'] = 'memory'
+        build_search_index()
+        self.addCleanup(search_index.clear)
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?name=kfc').data)
+        self.assertEqual(response['total_businesses'], 1)
+        self.app.post(self.url_prefix + 'businesses', data=json.dumps(
+            dict(self.business_data, name='KFC Kigali')),
+            headers={'Authorization': self.test_token})
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?name=kfc&limit=1&page=2'
+            '&fields=name').data)
+        self.assertEqual(response['total_businesses'], 2)
+        self.assertEqual(response['businesses'], [{'name': 'KFC Kigali'}])
+
+    def test_ngram_index(self):
+        '''
+            Test edit distance lookups find the close words only
+        '''
+        self.assertEqual(edit_distance('nairobbi', 'nairobi'), 1)
+        self.assertEqual(edit_distance('kigail', 'kigali'), 2)
+        index = NgramIndex()
+        for word in ['nairobi', 'kigali', 'kampala', 'coffee', 'toffee']:
+            index.add(word)
+        self.assertEqual(index.find('nairobbi', 1), [(1, 'nairobi')])
+        self.assertEqual(index.find('kigail', 1), [])
+        self.assertEqual(index.find('kigail', 2), [(2, 'kigali')])
+        self.assertEqual(sorted(index.find('koffee', 1)),
+                         [(1, 'coffee'), (1, 'toffee')])
+        self.assertEqual(index.find('kfc', 0), [])
+
+    def test_fuzzy_search_listing(self):
+        '''
+            Test misspelled names and cities find businesses, new ones
+            included
+        '''
+        self.addCleanup(fuzzy_index.clear)
+        self.add_business()
+        build_fuzzy_index()
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?name=rooftp%20cofee'
+            '&match=fuzzy&fields=name').data)
+        self.assertEqual(response['businesses'],
+                         [{'name': self.business_data['name']}])
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?city=nairobbi&match=fuzzy').data)
+        self.assertEqual(response['total_businesses'], 2)
+        self.app.post(self.url_prefix + 'businesses', data=json.dumps(
+            dict(self.business_data, name='Kimironko market')),
+            headers={'Authorization': self.test_token})
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?name=kimironco'
+            '&match=fuzzy&fields=name').data)
+        self.assertEqual(response['businesses'],
+                         [{'name': 'Kimironko market'}])
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?name=kimironco').data)
+        self.assertEqual(response['message'], 'No business found!')
+
+    def test_folded_search_keys(self):
+        '''
+            Test accented businesses match plain queries and keys follow
+            updates
+        '''
+        self.add_business()
+        business = Business.query.filter_by(
+            name=self.business_data['name']).first()
+        Business.update(business.id, dict(
+            self.business_data, name='Café Côte', city='Gisenyi'))
+        self.assertEqual((business.name_key, business.city_key),
+                         ('cafe cote', 'gisenyi'))
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses?name=CAFE%20cote&fields=name').data)
+        self.assertEqual(response['businesses'], [{'name': 'Café Côte'}])
+        response = json.loads(self.app.get(
+            self.url_prefix + 'account/businesses?name=caf%C3%A9'
+            '&city=GISENYI&fields=name',
+            headers={'Authorization': self.test_token}).data)
+        self.assertEqual(response['businesses'], [{'name': 'Café Côte'}])
+
+    def test_suggest_index(self):
+        '''
+            Test suggestions are word prefixes ordered by popularity
+        '''
+        index = SuggestIndex()
+        index.build([
+            ('Java House', 'Coffee', 'Nairobi', 'Kenya'),
+            ('Java House', 'Cafe', 'Kigali', 'Rwanda'),
+            ('Kigali Café', 'Coffee', 'Kigali', 'Rwanda'),
+        ])
+        self.assertEqual(index.suggest('ki'), [
+            ('city', 'Kigali', 2), ('name', 'Kigali Café', 1)])
+        self.assertEqual(index.suggest('HOU'), [('name', 'Java House', 2)])
+        self.assertEqual(index.suggest('cafe', 1), [('category', 'Cafe', 1)])
+        index.remove(('Kigali Café', 'Coffee', 'Kigali', 'Rwanda'))
+        index.add(('Kampala Café', 'Coffee', 'Kampala', 'Uganda'))
+        self.assertEqual(index.suggest('k'), [
+            ('country', 'Kenya', 1), ('city', 'Kigali', 1),
+            ('city', 'Kampala', 1), ('name', 'Kampala Café', 1)])
+        self.assertEqual(index.suggest(' '), [])
+
+    def test_indexes_build_retried(self):
+        '''
+            Test a failed indexes build is retried until it succeeds
+        '''
+        self.main.config['SEARCH_BACKEND'] = 'memory'
+        self.addCleanup(search_index.clear)
+        self.addCleanup(fuzzy_index.clear)
+        self.addCleanup(suggest_index.clear)
+        with mock.patch('api.search.backends.time.sleep') as sleep, \
+                mock.patch('api.search.backends.build_suggest_index',
+                           side_effect=[OperationalError('', {}, None),
+                                        OperationalError('', {}, None),
+                                        None]) as build:
+            build_indexes(self.main)
+        self.assertEqual(build.call_count, 3)
+        self.assertEqual([call[0][0] for call in sleep.call_args_list],
+                         [1, 2])
+        self.assertTrue(search_index.ready)
+
+    def test_writes_during_build(self):
+        '''
+            Test writes made while an index reads its rows are kept
+        '''
+        index = SuggestIndex()
+
+        def rows():
+            ''' Rows with a business added while they are read '''
+            yield ('Java House', 'Coffee', 'Nairobi', 'Kenya')
+            index.add(('Kigali Café', 'Coffee', 'Kigali', 'Rwanda'))
+        index.build(rows())
+        self.assertEqual(index.suggest('ki'), [
+            ('city', 'Kigali', 1), ('name', 'Kigali Café', 1)])
+        self.assertEqual(index.suggest('co'), [('category', 'Coffee', 2)])
+        index = FuzzyIndex()
+
+        def words():
+            ''' Rows with a business added while they are read '''
+            yield ('Java House', 'Coffee', 'Nairobi')
+            index.add(('Kimironko market', 'Market', 'Kigali'))
+        index.build(words())
+        self.assertEqual(index.expand('name', 'kimironco'), [['kimironko']])
+
+    def test_suggest_businesses(self):
+        '''
+            Test typeahead suggestions follow business writes
+        '''
+        self.addCleanup(suggest_index.clear)
+        self.add_business()
+        response = self.app.get(self.url_prefix + 'businesses/suggest?q=nair')
+        self.assertEqual(response.status_code, 503)
+        build_suggest_index()
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses/suggest?q=nair').data)
+        self.assertEqual(response['suggestions'], [
+            {'field': 'city', 'value': 'Nairobi', 'businesses': 2}])
+        self.app.post(self.url_prefix + 'businesses', data=json.dumps(
+            dict(self.business_data, name='Roots Bar', city='Kigali')),
+            headers={'Authorization': self.test_token})
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses/suggest?q=ro&limit=1').data)
+        self.assertEqual(response['suggestions'], [
+            {'field': 'name', 'value': 'Roots Bar', 'businesses': 1}])
+        response = json.loads(self.app.get(
+            self.url_prefix + 'businesses/suggest?q=ro').data)
+        self.assertEqual([suggestion['value'] for suggestion in
+                          response['suggestions']],
+                         ['Roots Bar', 'Inzora rooftop coffee'])
+        response = self.app.get(self.url_prefix + 'businesses/suggest?q=')
+        self.assertEqual(response.status_code, 400)
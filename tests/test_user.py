@@ -3,8 +3,15 @@
 '''
 from flask import json
 from tests.test_api import MainTests
+from datetime import datetime, timedelta
+from threading import Event
 from api.models.password_reset import PasswordReset
-from api.helpers import generate_reset_token
+from api.models.token import Token
+from api.helpers import generate_reset_token, get_token
+from api.reaper import reap_expired_tokens
+from api.models.user import User
+from api.conf import hasher
+from api.passwords import PasswordHasherBusy
 from api.models import db
 
 
@@ -85,6 +92,70 @@ class UserTests(MainTests):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'successfully logged', response.data)
 
+    def test_repeated_login(self):
+        '''
+            Testing logging in twice within a second gets distinct tokens
+        '''
+        tokens = []
+        for _ in range(2):
+            response = self.app.post(
+                self.url_prefix + 'auth/login', data=json.dumps({
+                    'email': self.sample_user['email'],
+                    'password': self.sample_user['password']
+                }), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            tokens.append(json.loads(response.data)['access_token'])
+        self.assertNotEqual(tokens[0], tokens[1])
+        # Only the token digest is stored
+        self.assertIsNone(Token.get_by_token(tokens[0]).access_token)
+        token = tokens[-1]
+        response = self.app.get(self.url_prefix + 'account/businesses',
+                                headers={'Authorization': token})
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_rehash(self):
+        '''
+            Testing password rehash on login after changing its cost
+        '''
+        hasher.method = 'pbkdf2:sha256:1000'
+        response = self.app.post(
+            self.url_prefix + 'auth/login', data=json.dumps({
+                'email': self.sample_user['email'],
+                'password': self.sample_user['password']
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        user = User.query.get(self.sample_user['id'])
+        self.assertTrue(user.password.startswith('pbkdf2:sha256:1000$'))
+
+    def test_busy_password_hasher(self):
+        '''
+            Testing login shedding when the hashing queue is full
+        '''
+        hasher.queue_size = -hasher.workers
+        response = self.app.post(
+            self.url_prefix + 'auth/login', data=json.dumps({
+                'email': self.sample_user['email'],
+                'password': self.sample_user['password']
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(hasher.stats()['rejected'], 1)
+
+    def test_password_hash_timeout(self):
+        '''
+            Testing slow hashing is rejected and stays counted as pending
+            until it ends
+        '''
+        release = Event()
+        hasher.timeout = 0.01
+        with self.assertRaises(PasswordHasherBusy):
+            hasher.run(release.wait)
+        self.assertEqual(hasher.stats()['timed_out'], 1)
+        self.assertEqual(hasher.stats()['pending'], 1)
+        release.set()
+        hasher.executor().shutdown(wait=True)
+        self.assertEqual(hasher.stats()['pending'], 0)
+        hasher.shutdown()
+
     def test_unconfirmed_email_check(self):
         '''
             Testing unconfirmed email check
@@ -110,6 +181,46 @@ class UserTests(MainTests):
         self.assertEqual(response.status_code, 401)
         self.assertIn(b'Invalid email or password', response.data)
 
+    def test_login_brute_force(self):
+        '''
+            Testing login attempts over the limit are rejected
+        '''
+        for _ in range(self.main.config['LOGIN_EMAIL_RATE_LIMIT']):
+            self.app.post(
+                self.url_prefix + 'auth/login',
+                data=json.dumps({
+                    'email': self.sample_user['email'],
+                    'password': 'anyinvalidpassword'
+                }), content_type='application/json')
+        response = self.app.post(
+            self.url_prefix + 'auth/login', data=json.dumps({
+                'email': self.sample_user['email'],
+                'password': self.sample_user['password']
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_login_ip_limit_ignores_forwarded_for(self):
+        '''
+            Testing forged X-Forwarded-For headers share the peer limit
+        '''
+        # One more than the limit, the previous window counts partly
+        for attempt in range(self.main.config['LOGIN_IP_RATE_LIMIT'] + 1):
+            self.app.post(
+                self.url_prefix + 'auth/login',
+                data=json.dumps({
+                    'email': 'user{}@gmail.com'.format(attempt),
+                    'password': 'anyinvalidpassword'
+                }), content_type='application/json',
+                headers={'X-Forwarded-For': '10.0.0.{}'.format(attempt)})
+        response = self.app.post(
+            self.url_prefix + 'auth/login', data=json.dumps({
+                'email': self.sample_user['email'],
+                'password': self.sample_user['password']
+            }), content_type='application/json',
+            headers={'X-Forwarded-For': '10.0.1.1'})
+        self.assertEqual(response.status_code, 429)
+
     def test_unconfirmed_email(self):
         '''
             Testing login with unconfirmed email
@@ -159,6 +270,18 @@ class UserTests(MainTests):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'You have successfully logged out', response.data)
 
+    def test_logged_out_token(self):
+        '''
+            Test cached token is rejected after logout
+        '''
+        self.app.get(self.url_prefix + 'account/businesses',
+                     headers={'Authorization': self.test_token})
+        self.app.post(self.url_prefix + 'auth/logout',
+                      data={}, headers={'Authorization': self.test_token})
+        response = self.app.get(self.url_prefix + 'account/businesses',
+                                headers={'Authorization': self.test_token})
+        self.assertEqual(response.status_code, 401)
+
     def test_invalid_reset(self):
         '''
             Testing reset password email with invalid input
@@ -235,6 +358,48 @@ class UserTests(MainTests):
         self.assertIn(
             b'Invalid reset token', response.data)
 
+    def test_expired_password_reset(self):
+        '''
+            Testing reset password with an expired token
+        '''
+        gen_token = generate_reset_token()
+        token = PasswordReset(
+            user_id=self.sample_user['id'], reset_token=gen_token,
+            expires_at=datetime.utcnow() - timedelta(seconds=1))
+        db.session.add(token)
+        db.session().commit()
+        response = self.app.post(
+            self.url_prefix + 'auth/reset-password/'+gen_token,
+            data=json.dumps({
+                'email': self.sample_user['email'],
+                'password': 'awesome',
+                'confirm_password': 'awesome'
+            }),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(
+            b'Invalid reset token', response.data)
+
+    def test_reap_expired_tokens(self):
+        '''
+            Testing deleting expired access and reset tokens
+        '''
+        expired_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.add(PasswordReset(
+            user_id=self.sample_user['id'],
+            reset_token=generate_reset_token(), expires_at=expired_at))
+        db.session.add(Token(
+            user_id=self.orphan_id, access_token=get_token(self.orphan_id, 1),
+            expires_at=expired_at))
+        db.session.commit()
+        tokens_count = Token.query.count()
+        reclaimed = reap_expired_tokens(batch_size=1)
+        self.assertEqual(reclaimed, {
+            'access_tokens': 1,
+            'password_reset_tokens': 1,
+        })
+        self.assertEqual(Token.query.count(), tokens_count - 1)
+
     def test_inv_password_reset(self):
         '''
             Testing reset password with a invalid input
@@ -347,6 +512,20 @@ class UserTests(MainTests):
         self.assertIn(
             b'Unauthorize', response.data)
 
+    def test_retired_key_token(self):
+        '''
+            Testing token signed with a retired secret key
+        '''
+        self.main.config['RETIRED_SECRET_KEYS'] = ['retired_signature']
+        token = Token(user_id=self.sample_user['id'], access_token=get_token(
+            self.sample_user['id'], 3600, 'retired_signature'))
+        db.session.add(token)
+        db.session.commit()
+        response = self.app.get(
+            self.url_prefix + 'account/businesses',
+            headers={'Authorization': token.access_token})
+        self.assertEqual(response.status_code, 200)
+
     def test_validation_methods(self):
         '''
             Test validation methods (same,minimum,email,string)